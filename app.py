@@ -2,27 +2,34 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
+from datetime import datetime
+from functools import partial
 from html import unescape
 from logging import getLogger, Formatter, WARNING, INFO
 from logging.handlers import RotatingFileHandler
 from os.path import dirname, join as pathjoin
-from urllib.parse import parse_qs, urlparse, unquote
+from urllib.parse import parse_qs, urlparse, unquote, urlsplit, urlunsplit
 from wsgiref.headers import Headers
 
-from requests import ConnectionError as RequestsConnectionError
+from requests import ConnectionError as RequestsConnectionError, Timeout
 
-from config import LANG
-from lib.ketabir import ketabir_sfn_cit_ref
-from lib.commons import uninum2en, sfn_cit_ref_to_json
-from lib.doi import doi_sfn_cit_ref, DOI_SEARCH
-from lib.googlebooks import googlebooks_sfn_cit_ref
+from config import LANG, REQUEST_DEADLINE
+from lib.cache import TwoTierCache, MISSING, HOUR, DAY
+from lib.ketabir import async_ketabir_sfn_cit_ref
+from lib.commons import (
+    uninum2en, sfn_cit_ref_to_json, run_sync, RateLimitError)
+from lib.deadline import DEADLINE, Deadline, is_degraded
+from lib.doi import async_doi_sfn_cit_ref, DOI_SEARCH
+from lib.googlebooks import async_googlebooks_sfn_cit_ref
 from lib.isbn_oclc import (
-    ISBN_10OR13_SEARCH, IsbnError, isbn_sfn_cit_ref, oclc_sfn_cit_ref)
-from lib.noorlib import noorlib_sfn_cit_ref
-from lib.noormags import noormags_sfn_cit_ref
-from lib.pubmed import pmcid_sfn_cit_ref, pmid_sfn_cit_ref
-from lib.urls import urls_sfn_cit_ref
-from lib.waybackmachine import waybackmachine_sfn_cit_ref
+    ISBN_10OR13_SEARCH, IsbnError, async_isbn_sfn_cit_ref,
+    async_oclc_sfn_cit_ref)
+from lib.noorlib import async_noorlib_sfn_cit_ref
+from lib.noormags import async_noormags_sfn_cit_ref
+from lib.pubmed import (
+    NON_DIGITS_SUB, async_pmcid_sfn_cit_ref, async_pmid_sfn_cit_ref)
+from lib.urls import async_urls_sfn_cit_ref
+from lib.waybackmachine import async_waybackmachine_sfn_cit_ref
 if LANG == 'en':
     from lib.html.en import (
         DEFAULT_SFN_CIT_REF,
@@ -46,15 +53,59 @@ else:
 
 
 TLDLESS_NETLOC_RESOLVER = {
-    'ketab': ketabir_sfn_cit_ref,
-    'noorlib': noorlib_sfn_cit_ref,
-    'noormags': noormags_sfn_cit_ref,
-    'web.archive': waybackmachine_sfn_cit_ref,
-    'web-beta.archive': waybackmachine_sfn_cit_ref,
-    'books.google.co': googlebooks_sfn_cit_ref,
-    'books.google': googlebooks_sfn_cit_ref,
+    'ketab': async_ketabir_sfn_cit_ref,
+    'noorlib': async_noorlib_sfn_cit_ref,
+    'noormags': async_noormags_sfn_cit_ref,
+    'web.archive': async_waybackmachine_sfn_cit_ref,
+    'web-beta.archive': async_waybackmachine_sfn_cit_ref,
+    'books.google.co': async_googlebooks_sfn_cit_ref,
+    'books.google': async_googlebooks_sfn_cit_ref,
 }.get
 
+# Time-to-live of cached citations for each resolver (in seconds).
+# Web pages change, but DOIs, ISBNs, etc. rarely do.
+RESOLVER_TTL = {
+    async_urls_sfn_cit_ref: 6 * HOUR,
+    async_waybackmachine_sfn_cit_ref: DAY,
+}.get
+DEFAULT_TTL = 30 * DAY
+
+
+def normalize_url(url: str) -> str:
+    """Casefold the scheme and host of url and remove its trailing slash."""
+    scheme, netloc, path, query, fragment = urlsplit(url.strip())
+    return urlunsplit((
+        scheme.casefold(), netloc.casefold(), path.rstrip('/'), query,
+        fragment))
+
+
+def normalize_doi(doi: str) -> str:
+    """DOIs are case-insensitive."""
+    return doi.strip().casefold()
+
+
+def normalize_isbn(isbn: str) -> str:
+    """Remove the hyphens and spaces of isbn."""
+    return isbn.replace('-', '').replace(' ', '').upper()
+
+
+def normalize_id(id_: str) -> str:
+    """Remove the prefix of a PMID, PMCID or OCLC number, e.g. 'PMID: '."""
+    return NON_DIGITS_SUB('', id_)
+
+
+# How the input of each resolver is normalized for SFN_CIT_REF_CACHE keys.
+# The other resolvers take URLs.
+INPUT_NORMALIZER = {
+    async_doi_sfn_cit_ref: normalize_doi,
+    async_isbn_sfn_cit_ref: normalize_isbn,
+    async_pmid_sfn_cit_ref: normalize_id,
+    async_pmcid_sfn_cit_ref: normalize_id,
+    async_oclc_sfn_cit_ref: normalize_id,
+}.get
+
+SFN_CIT_REF_CACHE = TwoTierCache('sfn_cit_ref')
+
 RESPONSE_HEADERS = Headers([('Content-Type', 'text/html; charset=UTF-8')])
 
 
@@ -84,13 +135,16 @@ LOGGER = get_root_logger()
 
 
 def url_doi_isbn_to_sfn_cit_ref(user_input, date_format) -> tuple:
+    return run_sync(async_url_doi_isbn_to_sfn_cit_ref(user_input, date_format))
+
+
+async def async_url_doi_isbn_to_sfn_cit_ref(user_input, date_format) -> tuple:
     en_user_input = unquote(uninum2en(user_input))
     # Checking the user input for dot is important because
     # the use of dotless domains is prohibited.
     # See: https://features.icann.org/dotless-domains
     if '.' in en_user_input:
         # Try predefined URLs
-        # Todo: The following code could be done in threads.
         if not user_input.startswith('http'):
             url = 'http://' + user_input
         else:
@@ -101,24 +155,55 @@ def url_doi_isbn_to_sfn_cit_ref(user_input, date_format) -> tuple:
             tldless_netloc[4:] if tldless_netloc.startswith('www.')
             else tldless_netloc)
         if resolver:
-            return resolver(url, date_format)
+            return await cached_sfn_cit_ref(resolver, url, date_format)
         # DOIs contain dots
         m = DOI_SEARCH(unescape(en_user_input))
         if m:
-            return doi_sfn_cit_ref(m[1], True, date_format)
-        return urls_sfn_cit_ref(url, date_format)
+            return await cached_sfn_cit_ref(
+                async_doi_sfn_cit_ref, m[1], date_format, True)
+        return await cached_sfn_cit_ref(
+            async_urls_sfn_cit_ref, url, date_format)
     else:
         # We can check user inputs containing dots for ISBNs, but probably is
         # error prone.
         m = ISBN_10OR13_SEARCH(en_user_input)
         if m:
             try:
-                return isbn_sfn_cit_ref(m[0], True, date_format)
+                return await cached_sfn_cit_ref(
+                    async_isbn_sfn_cit_ref, m[0], date_format, True)
             except IsbnError:
                 pass
         return UNDEFINED_INPUT_SFN_CIT_REF
 
 
+async def cached_sfn_cit_ref(
+    resolver, user_input: str, date_format: str, *args
+) -> tuple:
+    """Return resolver(user_input, *args, date_format=date_format).
+
+    The result is cached in SFN_CIT_REF_CACHE. The key consists of the
+    resolver, its input normalized by INPUT_NORMALIZER, its arguments, LANG,
+    date_format and today's date. The date is needed because of the
+    access-date parameter; therefore entries never outlive the current day.
+    Only complete and successful responses (those having a ref) are cached.
+    """
+    now = datetime.now()
+    key = (
+        resolver.__qualname__,
+        INPUT_NORMALIZER(resolver, normalize_url)(user_input), args, LANG,
+        date_format, now.date().isoformat())
+    response = SFN_CIT_REF_CACHE.get(key)
+    if response is not MISSING:
+        return response
+    response = await resolver(user_input, *args, date_format=date_format)
+    if response[2] and not is_degraded():
+        end_of_day = datetime.combine(now.date(), datetime.max.time())
+        SFN_CIT_REF_CACHE.set(key, tuple(response), min(
+            RESOLVER_TTL(resolver, DEFAULT_TTL),
+            (end_of_day - now).total_seconds()))
+    return response
+
+
 def app(environ, start_response):
     query_dict_get = parse_qs(environ['QUERY_STRING']).get
 
@@ -149,9 +234,26 @@ def app(environ, start_response):
     output_format = query_dict_get('output_format', [''])[0]  # apiquery
 
     resolver = input_type_to_resolver[input_type]
+    deadline_token = DEADLINE.set(Deadline(REQUEST_DEADLINE))
     # noinspection PyBroadException
     try:
-        response = resolver(user_input, date_format)
+        response = run_sync(resolver(user_input, date_format))
+    except RateLimitError:
+        status = '503 Service Unavailable'
+        LOGGER.warning('rate limited: %s', user_input)
+        if output_format == 'json':
+            response_body = sfn_cit_ref_to_json(HTTPERROR_SFN_CIT_REF)
+        else:
+            response_body = sfn_cit_ref_to_html(
+                HTTPERROR_SFN_CIT_REF, date_format, input_type)
+    except Timeout:
+        status = '504 Gateway Timeout'
+        LOGGER.warning('timed out: %s', user_input)
+        if output_format == 'json':
+            response_body = sfn_cit_ref_to_json(HTTPERROR_SFN_CIT_REF)
+        else:
+            response_body = sfn_cit_ref_to_html(
+                HTTPERROR_SFN_CIT_REF, date_format, input_type)
     except RequestsConnectionError:
         status = '500 ConnectionError'
         LOGGER.exception(user_input)
@@ -175,6 +277,7 @@ def app(environ, start_response):
         else:
             response_body = sfn_cit_ref_to_html(
                 response, date_format, input_type)
+    DEADLINE.reset(deadline_token)
     response_body = response_body.encode()
     RESPONSE_HEADERS['Content-Length'] = str(len(response_body))
     start_response(status, RESPONSE_HEADERS.items())
@@ -182,11 +285,11 @@ def app(environ, start_response):
 
 
 input_type_to_resolver = defaultdict(
-    lambda: url_doi_isbn_to_sfn_cit_ref, {
-        'url-doi-isbn': url_doi_isbn_to_sfn_cit_ref,
-        'pmid': pmid_sfn_cit_ref,
-        'pmcid': pmcid_sfn_cit_ref,
-        'oclc': oclc_sfn_cit_ref})
+    lambda: async_url_doi_isbn_to_sfn_cit_ref, {
+        'url-doi-isbn': async_url_doi_isbn_to_sfn_cit_ref,
+        'pmid': partial(cached_sfn_cit_ref, async_pmid_sfn_cit_ref),
+        'pmcid': partial(cached_sfn_cit_ref, async_pmcid_sfn_cit_ref),
+        'oclc': partial(cached_sfn_cit_ref, async_oclc_sfn_cit_ref)})
 
 
 if __name__ == '__main__':
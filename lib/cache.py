@@ -0,0 +1,194 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Caches for computed results, e.g. generated citations.
+
+A TwoTierCache keeps recently used entries in an in-process LRU dict and
+all entries in an SQLite database that is shared by the worker processes.
+Every entry has its own time-to-live.
+
+The cached_dict decorator caches the metadata dicts that the resolvers pass
+to dict_to_sfn_cit_ref. These dicts do not depend on date_format, therefore
+rendering a citation in another format does not require any fetch.
+"""
+
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
+from functools import wraps
+from logging import getLogger
+from os.path import abspath, dirname, join as pathjoin
+from pickle import dumps as pickle_dumps, loads as pickle_loads, \
+    HIGHEST_PROTOCOL, PicklingError
+from sqlite3 import connect, Error as SQLiteError
+from threading import Lock, local
+from time import time
+
+from config import CACHE_PATH, CACHE_LRU_SIZE, LANG
+from lib.deadline import is_degraded
+
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SRCDIR = dirname(dirname(abspath(__file__)))
+DB_PATH = pathjoin(SRCDIR, CACHE_PATH) if CACHE_PATH else None
+
+# Returned by get methods if the key is not in the cache.
+MISSING = object()
+
+connections = local()
+
+
+class LRUCache:
+
+    """A thread-safe in-process LRU cache with per-entry expiration."""
+
+    def __init__(self, maxsize: int = CACHE_LRU_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires <= time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float, expires: float = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires or time() + ttl), value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def db():
+    """Return the SQLite connection of the current thread."""
+    connection = getattr(connections, 'connection', None)
+    if connection is None:
+        connection = connections.connection = connect(
+            DB_PATH, timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+    return connection
+
+
+class SQLiteCache:
+
+    """A cache that pickles the values into a table of the SQLite database.
+
+    Errors of the database are logged and treated as cache misses. Values
+    that cannot be pickled are logged and not stored.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self._created = False
+
+    def _db(self):
+        connection = db()
+        if not self._created:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ' + self.table
+                + ' (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ' + self.table + '_expires'
+                ' ON ' + self.table + ' (expires)')
+            self._created = True
+        return connection
+
+    def get(self, key, default=MISSING) -> tuple:
+        """Return (value, expiration_time) or (default, 0)."""
+        try:
+            row = self._db().execute(
+                'SELECT value, expires FROM ' + self.table
+                + ' WHERE key = ? AND expires > ?',
+                (repr(key), time())).fetchone()
+        except SQLiteError:
+            logger.exception('SQLiteCache.get failed')
+            return default, 0
+        if row is None:
+            return default, 0
+        return pickle_loads(row[0]), row[1]
+
+    def set(self, key, value, ttl: float) -> None:
+        now = time()
+        try:
+            connection = self._db()
+            connection.execute(
+                'INSERT OR REPLACE INTO ' + self.table
+                + ' VALUES (?, ?, ?)',
+                (repr(key), pickle_dumps(value, HIGHEST_PROTOCOL), now + ttl))
+            connection.execute(
+                'DELETE FROM ' + self.table + ' WHERE expires <= ?', (now,))
+        except (SQLiteError, PicklingError, TypeError, AttributeError):
+            logger.exception('SQLiteCache.set failed')
+
+
+class TwoTierCache:
+
+    """An LRUCache in front of an optional SQLiteCache.
+
+    The SQLite tier is not used if CACHE_PATH is empty in config.py.
+    Keys should have a stable repr, e.g. tuples of strings.
+    """
+
+    def __init__(self, table: str, maxsize: int = CACHE_LRU_SIZE):
+        self.lru = LRUCache(maxsize)
+        self.sqlite = SQLiteCache(table) if DB_PATH else None
+
+    def get(self, key, default=MISSING):
+        value = self.lru.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        if self.sqlite is None:
+            return default
+        value, expires = self.sqlite.get(key, MISSING)
+        if value is MISSING:
+            return default
+        self.lru.set(key, value, 0, expires)
+        return value
+
+    def set(self, key, value, ttl: float) -> None:
+        self.lru.set(key, value, ttl)
+        if self.sqlite is not None:
+            self.sqlite.set(key, value, ttl)
+
+
+DICT_CACHE = TwoTierCache('dicts')
+
+
+def cached_dict(ttl: float):
+    """Cache the dicts returned by the decorated coroutine function.
+
+    The key consists of the name of the function, its positional arguments
+    and LANG. A None result is not cached, neither is a result that may lack
+    optional data because the deadline of the user request has passed.
+    dict_to_sfn_cit_ref modifies its input, therefore every call returns a
+    new copy of the cached dict as a defaultdict(lambda: None).
+    """
+    def decorator(func):
+        name = func.__module__ + '.' + func.__qualname__
+
+        @wraps(func)
+        async def wrapper(*args):
+            key = name, args, LANG
+            d = DICT_CACHE.get(key)
+            if d is MISSING:
+                d = await func(*args)
+                if d is not None and not is_degraded():
+                    DICT_CACHE.set(key, deepcopy(dict(d)), ttl)
+                return d
+            return defaultdict(lambda: None, deepcopy(d))
+        return wrapper
+    return decorator
+
+
+logger = getLogger(__name__)
@@ -0,0 +1,180 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Find the character encoding of html pages and decode them.
+
+sniff_encoding tries, in order, the byte order mark, the charset of the
+content-type header, the meta charset in the first META_PRESCAN bytes, and
+the last declared encoding of the host. Only then is the encoding detected
+from the first DETECTION_WINDOW bytes, which are usually valid UTF-8.
+DECODE_STATS counts the pages by the step that found their encoding and
+the time spent in sniffing and decoding; see decode_stats. The counts are
+logged every DECODE_STATS_LOG_INTERVAL decoded pages.
+"""
+
+from codecs import (
+    BOM_UTF8, BOM_UTF16_BE, BOM_UTF16_LE, getincrementaldecoder,
+    lookup as codec_lookup)
+from collections import Counter
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from typing import Optional, Tuple
+
+from regex import VERBOSE, IGNORECASE
+from requests.compat import chardet
+
+from lib.cache import LRUCache, DAY
+from lib.regex_timeout import timed_compile
+
+
+# Number of bytes at the beginning of a page that are searched for the meta
+# charset, as in the prescan of the HTML standard.
+META_PRESCAN = 1024
+# Number of bytes at the beginning of a page that are used for detection.
+DETECTION_WINDOW = 16384
+# The encoding of the pages that are not valid UTF-8 and whose encoding
+# could not be detected.
+DEFAULT_ENCODING = 'iso8859-1'
+
+BOMS = (BOM_UTF8, 'utf-8'), (BOM_UTF16_LE, 'utf-16'), (BOM_UTF16_BE, 'utf-16')
+
+# https://stackoverflow.com/questions/3458217/how-to-use-regular-expression-to-match-the-charset-string-in-html
+CHARSET = timed_compile(
+    rb'''
+    <meta(?!\s*+(?>name|value)\s*+=)[^>]*?charset\s*+=[\s"']*+([^\s"'/>]*)
+    ''',
+    IGNORECASE | VERBOSE,
+).search
+CONTENT_TYPE_CHARSET = timed_compile(
+    r'''charset\s*+=[\s"']*+([^\s"';]++)''', IGNORECASE).search
+
+# The encodings that were declared by the pages of each host.
+HOST_ENCODINGS = LRUCache()
+HOST_ENCODING_TTL = DAY
+
+DECODE_STATS = Counter()
+DECODE_STATS_LOCK = Lock()
+DECODE_STATS_LOG_INTERVAL = 1000
+
+
+def count(step: str, seconds: float, nbytes: int = 0) -> None:
+    with DECODE_STATS_LOCK:
+        DECODE_STATS[step] += 1
+        DECODE_STATS[step + '_seconds'] += seconds
+        if nbytes:
+            DECODE_STATS[step + '_bytes'] += nbytes
+
+
+def decode_stats() -> dict:
+    """Return a copy of DECODE_STATS.
+
+    'sniff', 'detect', and 'decode' are the number of calls of these steps,
+    with '_seconds' and '_bytes' suffixes for their total time and input
+    size. 'decode_errors' is the number of pages that were invalid in their
+    encoding and had their invalid bytes replaced. The other
+    keys are the number of pages whose encoding was found by each step of
+    sniff_encoding.
+    """
+    with DECODE_STATS_LOCK:
+        return dict(DECODE_STATS)
+
+
+def encoding_name(name) -> Optional[str]:
+    """Return the normalized name of the encoding or None if unknown."""
+    if isinstance(name, bytes):
+        name = name.decode('latin-1')
+    try:
+        return codec_lookup(name).name
+    except LookupError:
+        return None
+
+
+def header_charset(content_type: Optional[str]) -> Optional[str]:
+    """Return the charset parameter of the content-type header."""
+    if content_type:
+        m = CONTENT_TYPE_CHARSET(content_type)
+        if m:
+            return m[1]
+    return None
+
+
+def detect_encoding(content: bytes) -> str:
+    """Return the encoding of the first DETECTION_WINDOW bytes of content."""
+    window = content[:DETECTION_WINDOW]
+    start = perf_counter()
+    try:
+        getincrementaldecoder('utf-8')().decode(window)
+        encoding = 'utf-8'
+    except UnicodeDecodeError:
+        encoding = encoding_name(
+            chardet.detect(window)['encoding'] or DEFAULT_ENCODING
+        ) or DEFAULT_ENCODING
+    count('detect', perf_counter() - start, len(window))
+    return encoding
+
+
+def find_encoding(
+    content: bytes, declared: Optional[str], host: Optional[str]
+) -> Tuple[str, str]:
+    """Return (step, encoding) for sniff_encoding."""
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return 'bom', encoding
+    encoding = encoding_name(declared) if declared else None
+    step = 'header'
+    if encoding is None:
+        m = CHARSET(content[:META_PRESCAN])
+        encoding = encoding_name(m[1]) if m else None
+        step = 'meta'
+    if encoding is not None:
+        if host is not None:
+            HOST_ENCODINGS.set(host, encoding, HOST_ENCODING_TTL)
+        return step, encoding
+    if host is not None:
+        encoding = HOST_ENCODINGS.get(host, None)
+        if encoding is not None:
+            return 'host', encoding
+    return 'detected', detect_encoding(content)
+
+
+def sniff_encoding(
+    content: bytes, declared: Optional[str] = None, host: Optional[str] = None
+) -> str:
+    """Return the normalized name of the encoding of the content of a page.
+
+    declared is the charset of the content-type header, if any. Unknown
+    encoding names are ignored.
+    """
+    start = perf_counter()
+    step, encoding = find_encoding(content, declared, host)
+    with DECODE_STATS_LOCK:
+        DECODE_STATS[step] += 1
+    count('sniff', perf_counter() - start)
+    return encoding
+
+
+def decode_content(content: bytes, encoding: str) -> str:
+    """Decode content that might have been cut in the middle of a character.
+
+    The bytes that are invalid in encoding, e.g. a Latin-1 byte after
+    DETECTION_WINDOW in a page detected as UTF-8, are replaced with U+FFFD;
+    the rest of the page is still decoded in encoding.
+    """
+    start = perf_counter()
+    try:
+        text = getincrementaldecoder(encoding)().decode(content)
+    except UnicodeDecodeError:
+        text = getincrementaldecoder(encoding)('replace').decode(content)
+        with DECODE_STATS_LOCK:
+            DECODE_STATS['decode_errors'] += 1
+    count('decode', perf_counter() - start, len(content))
+    with DECODE_STATS_LOCK:
+        log_stats = DECODE_STATS['decode'] % DECODE_STATS_LOG_INTERVAL == 0
+    if log_stats:
+        logger.info('decode stats: %s', decode_stats())
+    return text
+
+
+logger = getLogger(__name__)
+
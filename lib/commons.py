@@ -3,17 +3,32 @@
 
 """Common variables, functions, and classes used in string conversions, etc."""
 
+from asyncio import get_running_loop, run as asyncio_run
 from calendar import month_abbr, month_name
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
 from datetime import datetime
 from datetime import date as datetime_date
+from functools import partial, wraps
+from http.cookiejar import DefaultCookiePolicy
 from json import dumps as json_dumps
+from threading import BoundedSemaphore, Lock
+from time import monotonic, sleep
+from urllib.parse import urlparse
 
 from isbnlib import mask as isbn_mask, NotValidISBNError
 from jdatetime import date as jdate
 from regex import compile as regex_compile, VERBOSE, IGNORECASE
-from requests import Session
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
 
-from config import LANG, SPOOFED_USER_AGENT, NCBI_TOOL, NCBI_EMAIL, USER_AGENT
+from config import (
+    LANG, SPOOFED_USER_AGENT, NCBI_TOOL, NCBI_EMAIL, NCBI_API_KEY,
+    USER_AGENT, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_KEEP_ALIVE,
+    IO_THREADS)
+from lib.deadline import remaining_time, request_timeout, MAX_TIMEOUT
+from lib.regex_timeout import timed_compile
+from lib.http_cache import request as http_cache_request
 
 if LANG == 'en':
     from lib.generator_en import sfn_cit_ref
@@ -80,7 +95,8 @@ ANYDATE_PATTERN = (
     + '|' + r'(?<d>\d\d?)\ ' + jB + r'\ (?<Y>\d\d\d\d)'
     + r'|\b' + Y + zm + zd
     + ')')
-ANYDATE_SEARCH = regex_compile(ANYDATE_PATTERN, VERBOSE).search
+# It is used on whole html documents, see lib.regex_timeout.
+ANYDATE_SEARCH = timed_compile(ANYDATE_PATTERN, VERBOSE).search
 DIGITS_FINDALL = regex_compile(r'\d').findall
 MC_SUB = regex_compile(r'MC(\w)', IGNORECASE).sub
 
@@ -93,6 +109,11 @@ AGENT_HEADER = {
 SPOOFED_AGENT_HEADER = {'User-Agent': SPOOFED_USER_AGENT}
 
 
+class RateLimitError(RequestException):
+
+    """Raise when a request has to wait too long for its HostLimiter."""
+
+
 class InvalidNameError(ValueError):
 
     """Base class for RawName exceptions."""
@@ -103,12 +124,182 @@ class NumberInNameError(InvalidNameError):
     """Raise when a RawName() contains digits.."""
 
 
+def create_session() -> Session:
+    """Return a Session that keeps a pool of connections for each host.
+
+    The returned session is meant to be shared between all threads of the
+    process. Connection pools of urllib3 are thread-safe, but the cookie jar
+    is shared, therefore cookies are not stored on the session. (Cookies that
+    are set during the redirects of a single request are still honoured.)
+    """
+    session = Session()
+    # Each thread of EXECUTOR may hold a connection to the same host; a
+    # smaller pool would discard the connections that do not fit in it.
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=max(HTTP_POOL_MAXSIZE, IO_THREADS))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=()))
+    if not HTTP_KEEP_ALIVE:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+SESSION = create_session()
+
+
+# Futures of the calls that are currently running in coalesce.
+IN_FLIGHT = {}
+IN_FLIGHT_LOCK = Lock()
+
+
+def coalesce(key, func, *args, **kwargs):
+    """Call func(*args, **kwargs) unless a call with the same key is running.
+
+    Threads that ask for a key which is already in flight wait for the
+    running call and receive its result or exception. The result is shared
+    between the callers, so it should not be modified.
+    """
+    with IN_FLIGHT_LOCK:
+        future = IN_FLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = IN_FLIGHT[key] = Future()
+    if not leader:
+        return future.result()
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with IN_FLIGHT_LOCK:
+            del IN_FLIGHT[key]
+
+
+def single_flight(func):
+    """Decorate func to coalesce concurrent calls with the same arguments."""
+    @wraps(func)
+    def wrapper(*args):
+        return coalesce((func, args), func, *args)
+    return wrapper
+
+
+class HostLimiter:
+
+    """A token bucket and a concurrency limit for the requests to a host.
+
+    Use as a context manager around each request. Callers wait in a queue
+    for at most MAX_QUEUE_WAIT seconds, or until the deadline of the user
+    request, and then get a RateLimitError.
+    """
+
+    def __init__(self, rate: float, concurrency: int, burst: int = 1):
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.semaphore = BoundedSemaphore(concurrency)
+        self.lock = Lock()
+        # The time at which the bucket will be full again (GCRA).
+        self.tat = 0.
+
+    def __enter__(self):
+        max_wait = MAX_QUEUE_WAIT
+        remaining = remaining_time()
+        if remaining is not None:
+            max_wait = max(min(max_wait, remaining), 0)
+        deadline = monotonic() + max_wait
+        if not self.semaphore.acquire(timeout=max_wait):
+            raise RateLimitError('too many concurrent requests')
+        with self.lock:
+            now = monotonic()
+            tat = max(self.tat, now)
+            start = tat - self.tolerance
+            if start > deadline:
+                self.semaphore.release()
+                raise RateLimitError('request rate limit exceeded')
+            self.tat = tat + self.interval
+        if start > now:
+            sleep(start - now)
+
+    def __exit__(self, *_):
+        self.semaphore.release()
+
+
+MAX_QUEUE_WAIT = 5
+# Limits of the hosts that throttle or ban clients that send too many
+# requests, as (requests per second, concurrent requests).
+# https://www.ncbi.nlm.nih.gov/books/NBK25497/#chapter2.Usage_Guidelines_and_Requiremen
+# https://api.crossref.org/swagger-ui/index.html (the "polite" pool)
+HOST_LIMITERS = {
+    host: HostLimiter(*limits) for host, limits in {
+        'eutils.ncbi.nlm.nih.gov': (10 if NCBI_API_KEY else 3, 3),
+        'api.crossref.org': (10, 3),
+        'www.worldcat.org': (2, 2),
+    }.items()}
+
+
+def send(method, url, timeout=MAX_TIMEOUT, **kwargs):
+    """Call SESSION.request within the HostLimiter of the host, if any.
+
+    The timeout is shrunk to the remaining time of the user request.
+    """
+    limiter = HOST_LIMITERS.get(urlparse(url).hostname)
+    if limiter is None:
+        return SESSION.request(
+            method, url, timeout=min(timeout, request_timeout()), **kwargs)
+    with limiter:
+        return SESSION.request(
+            method, url, timeout=min(timeout, request_timeout()), **kwargs)
+
+
 def request(url, spoof=False, method='get', **kwargs):
-    with Session() as session:
-        return session.request(
-            method, url, timeout=10,
-            headers=SPOOFED_AGENT_HEADER if spoof else AGENT_HEADER,
-            **kwargs)
+    """Send the request using the shared session and lib.http_cache.
+
+    Concurrent GET requests that are not streamed share one upstream request.
+    Requests that are served from the cache are not rate limited.
+    """
+    send_ = partial(
+        http_cache_request, send, method, url,
+        headers=SPOOFED_AGENT_HEADER if spoof else AGENT_HEADER, **kwargs)
+    if method.lower() != 'get' or kwargs.get('stream'):
+        return send_()
+    return coalesce(
+        ('request', url, spoof, repr(sorted(kwargs.items()))), send_)
+
+
+# The resolvers are coroutines, but their I/O is not asyncio-native: requests
+# is blocking, so they delegate their upstream calls to a bounded thread pool
+# shared by all event loops, i.e. a bounded thread-pool fan-out. The number
+# of upstream requests in flight per process is at most IO_THREADS; the
+# others wait in the queue of the executor. Calls that wait in a HostLimiter
+# or for the leader of coalesce also occupy a thread of the pool.
+EXECUTOR = ThreadPoolExecutor(IO_THREADS, 'citer-io')
+
+
+def in_executor(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in EXECUTOR and return an awaitable future.
+
+    Context variables of the caller are visible to func. This must be called
+    from a coroutine or a callback of the running event loop.
+    """
+    return get_running_loop().run_in_executor(
+        EXECUTOR, partial(copy_context().run, func, *args, **kwargs))
+
+
+def run_sync(coroutine):
+    """Run the coroutine in a new event loop and return its result.
+
+    This is used by the synchronous *_sfn_cit_ref functions which are
+    called from app.app. Each WSGI request gets its own event loop and holds
+    its WSGI thread while the loop runs, so the number of citations in
+    flight per worker is bounded by the threads of the WSGI server, and
+    their upstream requests by IO_THREADS.
+    """
+    return asyncio_run(coroutine)
 
 
 def dict_to_sfn_cit_ref(dictionary) -> tuple:
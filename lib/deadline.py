@@ -0,0 +1,79 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""The time budget of a user request.
+
+app.app sets a Deadline in the DEADLINE context variable. The context is
+copied into the event loop of the resolvers and into the threads of
+lib.commons.in_executor, therefore every upstream request can shrink its
+timeout to the remaining time. Optional enrichments are awaited through
+`optional`, which gives up when the time is over and marks the deadline as
+degraded. Degraded results are incomplete and should not be cached.
+"""
+
+from asyncio import shield, wait_for, TimeoutError as AsyncioTimeoutError
+from contextvars import ContextVar
+from time import monotonic
+from typing import Optional
+
+from requests.exceptions import Timeout
+
+
+# Maximum timeout of each upstream request (in seconds).
+MAX_TIMEOUT = 10
+
+DEADLINE = ContextVar('DEADLINE', default=None)
+
+
+class Deadline:
+
+    __slots__ = 'time', 'degraded'
+
+    def __init__(self, seconds: float):
+        self.time = monotonic() + seconds
+        self.degraded = False
+
+    def remaining(self) -> float:
+        return self.time - monotonic()
+
+
+def remaining_time() -> Optional[float]:
+    """Return the remaining seconds or None if there is no deadline."""
+    deadline = DEADLINE.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def is_degraded() -> bool:
+    """Return True if an optional step has been skipped for lack of time."""
+    deadline = DEADLINE.get()
+    return deadline is not None and deadline.degraded
+
+
+def request_timeout() -> float:
+    """Return the timeout for an upstream request.
+
+    Raise requests.exceptions.Timeout if the deadline has passed.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return MAX_TIMEOUT
+    if remaining <= 0:
+        raise Timeout('the deadline of the request has passed')
+    return min(MAX_TIMEOUT, remaining)
+
+
+async def optional(awaitable, default=None):
+    """Await an optional step within the remaining time.
+
+    Return default if the deadline passes first. The awaitable is shielded,
+    so a shared future can be awaited again; the caller is responsible for
+    cancelling it when it is not needed anymore.
+    """
+    deadline = DEADLINE.get()
+    if deadline is None:
+        return await awaitable
+    try:
+        return await wait_for(shield(awaitable), max(deadline.remaining(), 0))
+    except AsyncioTimeoutError:
+        deadline.degraded = True
+        return default
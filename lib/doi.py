@@ -12,7 +12,8 @@ from html import unescape
 from langid import classify
 from regex import compile as regex_compile, VERBOSE
 
-from lib.commons import dict_to_sfn_cit_ref, request
+from lib.cache import cached_dict, DAY
+from lib.commons import dict_to_sfn_cit_ref, request, in_executor, run_sync
 from config import LANG
 
 
@@ -31,6 +32,13 @@ DOI_SEARCH = regex_compile(
 
 
 def doi_sfn_cit_ref(doi_or_url, pure=False, date_format='%Y-%m-%d') -> tuple:
+    """Return the response namedtuple."""
+    return run_sync(async_doi_sfn_cit_ref(doi_or_url, pure, date_format))
+
+
+async def async_doi_sfn_cit_ref(
+    doi_or_url, pure=False, date_format='%Y-%m-%d'
+) -> tuple:
     """Return the response namedtuple."""
     if pure:
         doi = doi_or_url
@@ -39,11 +47,18 @@ def doi_sfn_cit_ref(doi_or_url, pure=False, date_format='%Y-%m-%d') -> tuple:
         # decode percent encodings
         decoded_url = unquote(unescape(doi_or_url))
         doi = DOI_SEARCH(decoded_url)[1]
-    dictionary = get_crossref_dict(doi)
+    dictionary = await doi_dict(doi)
     dictionary['date_format'] = date_format
+    return dict_to_sfn_cit_ref(dictionary)
+
+
+@cached_dict(30 * DAY)
+async def doi_dict(doi: str) -> defaultdict:
+    """Return the dictionary of the given DOI."""
+    dictionary = await in_executor(get_crossref_dict, doi)
     if LANG == 'fa':
         dictionary['language'] = classify(dictionary['title'])[0]
-    return dict_to_sfn_cit_ref(dictionary)
+    return dictionary
 
 
 def get_crossref_dict(doi) -> defaultdict:
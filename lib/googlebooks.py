@@ -10,17 +10,30 @@ from urllib.parse import urlparse
 from langid import classify
 
 # import bibtex [1]
-from lib.commons import request
+from lib.cache import cached_dict, DAY
+from lib.commons import request, in_executor, run_sync
 from lib.ris import parse as ris_parse
 from lib.commons import dict_to_sfn_cit_ref
 
 
 def googlebooks_sfn_cit_ref(url, date_format='%Y-%m-%d') -> tuple:
     """Create the response namedtuple."""
+    return run_sync(async_googlebooks_sfn_cit_ref(url, date_format))
+
+
+async def async_googlebooks_sfn_cit_ref(url, date_format='%Y-%m-%d') -> tuple:
+    """Create the response namedtuple."""
+    dictionary = await googlebooks_dict(url)
+    dictionary['date_format'] = date_format
+    return dict_to_sfn_cit_ref(dictionary)
+
+
+@cached_dict(30 * DAY)
+async def googlebooks_dict(url) -> dict:
+    """Return the dictionary of the given Google Books URL."""
     # bibtex_result = get_bibtex(url) [1]
     # dictionary = bibtex.parse(bibtex_result) [1]
-    dictionary = ris_parse(get_ris(url))
-    dictionary['date_format'] = date_format
+    dictionary = ris_parse(await in_executor(get_ris, url))
     pu = urlparse(url)
     pq = parse_qs(pu.query)
     # default domain is prefered:
@@ -32,7 +45,7 @@ def googlebooks_sfn_cit_ref(url, date_format='%Y-%m-%d') -> tuple:
     # although google does not provide a language field:
     if not dictionary['language']:
         dictionary['language'] = classify(dictionary['title'])[0]
-    return dict_to_sfn_cit_ref(dictionary)
+    return dictionary
 
 
 def get_bibtex(googlebook_url) -> bytes:
@@ -0,0 +1,473 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""An on-disk cache for the responses of upstream HTTP requests.
+
+The cache is a private cache in the sense of RFC 7234. Responses are stored
+in an SQLite database which can be shared by several worker processes.
+Freshness is computed from Cache-Control, Expires and Last-Modified headers.
+Stale entries that have an ETag or Last-Modified validator are revalidated
+using If-None-Match or If-Modified-Since. When the total size of the stored
+bodies exceeds HTTP_CACHE_MAX_SIZE, the least recently used entries are
+evicted.
+
+Only GET requests are cached. Entries are keyed by method, URL and body;
+the request headers (e.g. the spoofed user agent) are not part of the key,
+therefore responses having `Vary: *` are not stored. Streamed responses
+are read as far as the caller reads them. If the caller stops early, the
+part that was read is stored as a truncated entry. Fresh truncated entries
+are only served to streamed requests: a caller that reads past the stored
+part gets the rest from a new upstream request.
+"""
+
+from email.utils import parsedate_tz, mktime_tz
+from functools import partial
+from hashlib import sha256
+from itertools import chain
+from json import dumps as json_dumps, loads as json_loads
+from logging import getLogger
+from os.path import abspath, dirname, join as pathjoin
+from sqlite3 import connect, Error as SQLiteError
+from threading import local
+from time import time
+from typing import Optional
+
+from regex import compile as regex_compile
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config import HTTP_CACHE_PATH, HTTP_CACHE_MAX_SIZE
+
+
+SRCDIR = dirname(dirname(abspath(__file__)))
+DB_PATH = pathjoin(SRCDIR, HTTP_CACHE_PATH)
+# Larger bodies are never stored.
+MAX_ENTRY_SIZE = min(4000000, HTTP_CACHE_MAX_SIZE // 4)
+# Heuristic freshness for responses that only have a Last-Modified header.
+# See https://tools.ietf.org/html/rfc7234#section-4.2.2
+MAX_HEURISTIC_LIFETIME = 86400
+CHUNK_SIZE = 65536
+
+CACHE_CONTROL_FINDALL = regex_compile(
+    r'([\w-]++)\s*+(?:=\s*+"?([^",]*+)"?)?'
+).findall
+# These headers are not stored. The body is stored decoded.
+HOP_BY_HOP_HEADERS = {
+    'connection', 'content-encoding', 'keep-alive', 'transfer-encoding'}
+
+connections = local()
+
+
+def cache_control(headers: CaseInsensitiveDict) -> dict:
+    """Return Cache-Control directives of headers as a dict."""
+    return {
+        k.lower(): v for k, v in
+        CACHE_CONTROL_FINDALL(headers.get('cache-control', ''))}
+
+
+def http_date(value: Optional[str]) -> Optional[float]:
+    """Convert an HTTP-date to a timestamp. Return None if invalid."""
+    if not value:
+        return None
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return mktime_tz(parsed)
+
+
+def expiration_time(headers, now: float) -> float:
+    """Return the timestamp after which the response will be stale."""
+    headers = CaseInsensitiveDict(headers)
+    cc = cache_control(headers)
+    if 'no-cache' in cc:
+        return 0
+    date = http_date(headers.get('date')) or now
+    try:
+        age = int(headers.get('age', 0))
+    except ValueError:
+        age = 0
+    max_age = cc.get('max-age')
+    if max_age is not None:
+        try:
+            return now + int(max_age) - age
+        except ValueError:
+            return 0
+    expires = http_date(headers.get('expires'))
+    if expires is not None:
+        return now + expires - date - age
+    if 'expires' in headers:  # invalid Expires, e.g. "0", means expired
+        return 0
+    last_modified = http_date(headers.get('last-modified'))
+    if last_modified is not None and last_modified < date:
+        return now + min(
+            (date - last_modified) / 10, MAX_HEURISTIC_LIFETIME) - age
+    return 0
+
+
+def is_storable(r: Response) -> bool:
+    """Return True if the response may be stored in the cache."""
+    if r.status_code != 200:
+        return False
+    headers = r.headers
+    cc = cache_control(headers)
+    if 'no-store' in cc or headers.get('vary', '').strip() == '*':
+        return False
+    # A response that is neither fresh nor revalidatable is useless.
+    return (
+        'etag' in headers or 'last-modified' in headers
+        or expiration_time(headers, time()) > time())
+
+
+def db():
+    """Return the SQLite connection of the current thread."""
+    connection = getattr(connections, 'connection', None)
+    if connection is None:
+        connection = connections.connection = connect(
+            DB_PATH, timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT,'
+            ' content BLOB, size INTEGER, expires REAL, accessed REAL,'
+            ' truncated INTEGER)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_accessed'
+            ' ON responses (accessed)')
+    return connection
+
+
+def cache_key(method: str, url: str, data) -> str:
+    """Return the cache key for the given request."""
+    if data is None:
+        body = b''
+    elif isinstance(data, bytes):
+        body = data
+    elif isinstance(data, str):
+        body = data.encode()
+    else:
+        body = repr(sorted(dict(data).items())).encode()
+    return sha256(
+        method.upper().encode() + b' ' + url.encode() + b'\n' + body
+    ).hexdigest()
+
+
+def build_response(url: str, status: int, headers: dict, content: bytes):
+    """Create a consumed requests.Response object from the stored data."""
+    r = Response()
+    r.url = url  # The final URL after redirects
+    r.status_code = status
+    r.reason = 'OK'
+    r.headers = CaseInsensitiveDict(headers)
+    r.encoding = get_encoding_from_headers(r.headers)
+    r._content = content
+    r._content_consumed = True
+    return r
+
+
+def lookup(key: str) -> Optional[tuple]:
+    """Return (url, status, headers, content, expires, truncated) or None."""
+    row = db().execute(
+        'SELECT url, status, headers, content, expires, truncated'
+        ' FROM responses WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    url, status, headers, content, expires, truncated = row
+    return url, status, json_loads(headers), content, expires, bool(truncated)
+
+
+def store(
+    key: str, url: str, headers: CaseInsensitiveDict, content: bytes,
+    truncated: bool = False,
+) -> None:
+    """Store the response and evict old entries if needed.
+
+    If truncated is True, content is only the beginning of the body and the
+    Content-Length header, if any, is kept as is.
+    """
+    headers = {
+        k: v for k, v in headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS}
+    if not truncated:
+        headers['Content-Length'] = str(len(content))
+    now = time()
+    connection = db()
+    connection.execute(
+        'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            key, url, 200, json_dumps(headers), content, len(content),
+            expiration_time(headers, now), now, truncated))
+    evict(connection)
+
+
+def refresh(key: str, headers: dict, new_headers) -> dict:
+    """Update the stored headers using the headers of a 304 response."""
+    headers = CaseInsensitiveDict(headers)
+    for k, v in new_headers.items():
+        k_lower = k.lower()
+        if k_lower not in HOP_BY_HOP_HEADERS and k_lower != 'content-length':
+            headers[k] = v
+    headers = dict(headers)
+    now = time()
+    db().execute(
+        'UPDATE responses SET headers = ?, expires = ?, accessed = ?'
+        ' WHERE key = ?',
+        (json_dumps(headers), expiration_time(headers, now), now, key))
+    return headers
+
+
+def touch(key: str) -> None:
+    db().execute(
+        'UPDATE responses SET accessed = ? WHERE key = ?', (time(), key))
+
+
+def evict(connection) -> None:
+    """Remove least recently used entries until under the size limit."""
+    total = connection.execute(
+        'SELECT TOTAL(size) FROM responses').fetchone()[0]
+    if total <= HTTP_CACHE_MAX_SIZE:
+        return
+    excess = total - HTTP_CACHE_MAX_SIZE * .9
+    removed = 0
+    keys = []
+    for key, size in connection.execute(
+        'SELECT key, size FROM responses ORDER BY accessed'
+    ):
+        keys.append((key,))
+        removed += size
+        if removed >= excess:
+            break
+    connection.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+
+class ChainedRaw:
+
+    """Replacement for Response.raw that yields the already read chunks first.
+
+    Used when a streamed response turns out to be too large for the cache.
+    """
+
+    def __init__(self, chunks: list, rest, raw):
+        self._chunks = chain(chunks, rest)
+        self._raw = raw
+
+    def stream(self, amt=CHUNK_SIZE, decode_content=True):
+        buffer = bytearray()
+        for chunk in self._chunks:
+            buffer += chunk
+            while len(buffer) >= amt:
+                yield bytes(buffer[:amt])
+                del buffer[:amt]
+        if buffer:
+            yield bytes(buffer)
+
+    def __getattr__(self, name):
+        # close, release_conn, etc.
+        return getattr(self._raw, name)
+
+
+class RecordingRaw:
+
+    """Replacement for Response.raw that stores the body as far as it is read.
+
+    Used for streamed responses, whose callers may stop reading early. If the
+    caller reads the body to the end, it is stored as a complete entry.
+    Otherwise, the part that was read is stored as a truncated entry when the
+    response is closed. Nothing more than what the caller asks for is
+    downloaded and nothing is stored if more than MAX_ENTRY_SIZE is read.
+    """
+
+    def __init__(self, raw, key: str, r: Response):
+        self._raw = raw
+        self._key = key
+        self._url = r.url
+        self._headers = r.headers
+        self._chunks = []
+        self._size = 0
+
+    def stream(self, amt=CHUNK_SIZE, decode_content=True):
+        raw = self._raw
+        if hasattr(raw, 'stream'):
+            chunks = raw.stream(amt, decode_content=decode_content)
+        else:
+            chunks = iter(partial(raw.read, amt), b'')
+        for chunk in chunks:
+            if self._chunks is not None:
+                self._size += len(chunk)
+                if self._size > MAX_ENTRY_SIZE:
+                    self._chunks = None
+                else:
+                    self._chunks.append(chunk)
+            yield chunk
+        self._store(False)
+
+    def _store(self, truncated: bool) -> None:
+        chunks = self._chunks
+        self._chunks = None
+        if chunks is None or truncated and not chunks:
+            return
+        try:
+            store(
+                self._key, self._url, self._headers, b''.join(chunks),
+                truncated)
+        except SQLiteError:
+            logger.exception('HTTP cache update failed: %s', self._url)
+
+    def close(self):
+        # Called by Response.close if the body was not read to the end.
+        self._store(True)
+        self._raw.close()
+
+    def __getattr__(self, name):
+        # release_conn, etc.
+        return getattr(self._raw, name)
+
+
+class PrefixRaw:
+
+    """Replacement for Response.raw that serves a truncated cache entry.
+
+    The stored prefix is yielded first. If the caller reads past it, the
+    request is sent again using `resend` and the rest of the new body is
+    yielded. The new response is recorded like any other streamed response.
+    """
+
+    def __init__(self, prefix: bytes, resend):
+        self._prefix = prefix
+        self._resend = resend
+        self._raw = None
+
+    def stream(self, amt=CHUNK_SIZE, decode_content=True):
+        prefix = self._prefix
+        for i in range(0, len(prefix), amt):
+            yield prefix[i:i + amt]
+        r = self._resend()
+        if r.status_code != 200:
+            r.close()
+            return
+        self._raw = r.raw
+        skip = len(prefix)
+        for chunk in r.iter_content(amt):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            yield chunk
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.close()
+
+    def release_conn(self):
+        release_conn = getattr(self._raw, 'release_conn', None)
+        if release_conn is not None:
+            release_conn()
+
+
+def prefix_response(entry: tuple, resend) -> Response:
+    """Create a streamed response from a truncated entry."""
+    url, status, headers, content = entry[:4]
+    r = build_response(url, status, headers, None)
+    r._content = False
+    r._content_consumed = False
+    r.raw = PrefixRaw(content, resend)
+    return r
+
+
+def read_bounded(r: Response, limit: int) -> Optional[bytes]:
+    """Read the body of the streamed response r if it is not over limit.
+
+    Return None if the body is larger than limit. In that case, r remains
+    readable from the beginning.
+    """
+    chunks = []
+    size = 0
+    iterator = r.iter_content(CHUNK_SIZE)
+    for chunk in iterator:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            r.raw = ChainedRaw(chunks, iterator, r.raw)
+            return None
+    r._content = content = b''.join(chunks)
+    r._content_consumed = True
+    r.close()  # release the connection
+    return content
+
+
+def send_recorded(send, key: str, method: str, url: str, data, **kwargs):
+    """Send the streamed request and record the response if storable."""
+    r = send(method, url, data=data, stream=True, **kwargs)
+    if is_storable(r):
+        r.raw = RecordingRaw(r.raw, key, r)
+    return r
+
+
+def request(send, method: str, url: str, data=None, stream=False, **kwargs):
+    """Perform the request using the cache.
+
+    `send` is a callable with the signature of requests.Session.request.
+    """
+    if method.upper() != 'GET' or HTTP_CACHE_MAX_SIZE <= 0:
+        return send(method, url, data=data, stream=stream, **kwargs)
+    key = cache_key(method, url, data)
+    try:
+        entry = lookup(key)
+        if entry is not None and entry[5] and (
+            not stream or entry[4] <= time()
+        ):
+            # A truncated entry is useless for reading or revalidating the
+            # whole body.
+            entry = None
+        if entry is not None and entry[4] > time():
+            touch(key)
+            if entry[5]:
+                return prefix_response(entry, partial(
+                    send_recorded, send, key, method, url, data, **kwargs))
+            return build_response(*entry[:4])
+    except SQLiteError:
+        logger.exception('HTTP cache lookup failed: %s', url)
+        return send(method, url, data=data, stream=stream, **kwargs)
+    headers = dict(kwargs.pop('headers', None) or {})
+    if entry is not None:
+        stored_url, status, stored_headers, content, expires, _ = entry
+        stored_headers_get = CaseInsensitiveDict(stored_headers).get
+        etag = stored_headers_get('etag')
+        if etag:
+            headers['If-None-Match'] = etag
+        last_modified = stored_headers_get('last-modified')
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    r = send(method, url, data=data, stream=True, headers=headers, **kwargs)
+    try:
+        if entry is not None and r.status_code == 304:
+            r.close()
+            stored_headers = refresh(key, stored_headers, r.headers)
+            return build_response(stored_url, status, stored_headers, content)
+        if not is_storable(r):
+            if not stream:
+                r.content  # Consume the body as requests would do.
+            return r
+        if stream:
+            # Only what the caller reads is downloaded.
+            r.raw = RecordingRaw(r.raw, key, r)
+            return r
+        content_length = r.headers.get('content-length')
+        if content_length and content_length.isdigit() and (
+            int(content_length) > MAX_ENTRY_SIZE
+        ):
+            r.content
+            return r
+        content = read_bounded(r, MAX_ENTRY_SIZE)
+        if content is None:
+            r.content
+            return r
+        store(key, r.url, r.headers, content)
+    except SQLiteError:
+        logger.exception('HTTP cache update failed: %s', url)
+    return r
+
+
+logger = getLogger(__name__)
@@ -3,8 +3,8 @@
 """Define functions to process ISBNs and OCLC numbers."""
 
 # from collections import defaultdict
+from asyncio import gather
 from logging import getLogger
-from threading import Thread
 from typing import Optional
 
 from langid import classify
@@ -14,7 +14,10 @@ from config import LANG
 from lib.ketabir import url2dictionary as ketabir_url2dictionary
 from lib.ketabir import isbn2url as ketabir_isbn2url
 from lib.bibtex import parse as bibtex_parse
-from lib.commons import dict_to_sfn_cit_ref, request  # , Name
+from lib.cache import cached_dict, DAY
+from lib.commons import (  # , Name
+    dict_to_sfn_cit_ref, request, in_executor, run_sync)
+from lib.deadline import optional
 from lib.ris import parse as ris_parse
 
 
@@ -58,6 +61,14 @@ class IsbnError(Exception):
 
 def isbn_sfn_cit_ref(
     isbn_container_str: str, pure: bool = False, date_format: str = '%Y-%m-%d'
+) -> tuple:
+    """Create the response namedtuple."""
+    return run_sync(
+        async_isbn_sfn_cit_ref(isbn_container_str, pure, date_format))
+
+
+async def async_isbn_sfn_cit_ref(
+    isbn_container_str: str, pure: bool = False, date_format: str = '%Y-%m-%d'
 ) -> tuple:
     """Create the response namedtuple."""
     if pure:
@@ -71,51 +82,42 @@ def isbn_sfn_cit_ref(
             # search for isbn10
             m = ISBN10_SEARCH(isbn_container_str)
             isbn = m[0]
+    dictionary = await isbn_dict(isbn)
+    dictionary['date_format'] = date_format
+    return dict_to_sfn_cit_ref(dictionary)
 
-    ketabir_result_list = []
-    ketabir_thread = Thread(
-        target=ketabir_thread_target,
-        args=(isbn, ketabir_result_list))
-    ketabir_thread.start()
 
-    citoid_result_list = []
-    citoid_thread = Thread(
-        target=citoid_thread_target,
-        args=(isbn, citoid_result_list))
-    citoid_thread.start()
+@cached_dict(30 * DAY)
+async def isbn_dict(isbn: str) -> dict:
+    """Return the dictionary of the given ISBN."""
+    ottobib_bibtex, ketabir_dict, citoid_dict = await gather(
+        in_executor(ottobib, isbn),
+        in_executor(get_ketabir_dict, isbn),
+        optional(in_executor(get_citoid_dict_or_none, isbn)))
 
-    ottobib_bibtex = ottobib(isbn)
     if ottobib_bibtex:
         otto_dict = bibtex_parse(ottobib_bibtex)
     else:
         otto_dict = None
 
-    ketabir_thread.join()
-    if ketabir_result_list:
-        ketabir_dict = ketabir_result_list[0]
-    else:
-        ketabir_dict = None
     dictionary = choose_dict(ketabir_dict, otto_dict)
 
-    citoid_thread.join()
-    if citoid_result_list:
-        dictionary['oclc'] = citoid_result_list[0]['oclc']
+    if citoid_dict:
+        dictionary['oclc'] = citoid_dict['oclc']
 
-    dictionary['date_format'] = date_format
     if 'language' not in dictionary:
         dictionary['language'] = classify(dictionary['title'])[0]
-    return dict_to_sfn_cit_ref(dictionary)
+    return dictionary
 
 
-def ketabir_thread_target(isbn: str, result: list) -> None:
+def get_ketabir_dict(isbn: str) -> Optional[dict]:
+    """Return the ketab.ir dictionary of the isbn or None on failure."""
     # noinspection PyBroadException
     try:
         url = ketabir_isbn2url(isbn)
         if url is None:  # ketab.ir does not have any entries for this isbn
             return
-        d = ketabir_url2dictionary(url)
-        if d:
-            result.append(d)
+        return ketabir_url2dictionary(url) or None
     except Exception:
         logger.exception('isbn: %s', isbn)
         return
@@ -171,10 +173,13 @@ def get_citoid_dict(isbn) -> Optional[dict]:
     # return d
 
 
-def citoid_thread_target(isbn: str, result: list) -> None:
-    citoid_dict = get_citoid_dict(isbn)
-    if citoid_dict:
-        result.append(citoid_dict)
+def get_citoid_dict_or_none(isbn: str) -> Optional[dict]:
+    """Return get_citoid_dict(isbn) or None on failure."""
+    # noinspection PyBroadException
+    try:
+        return get_citoid_dict(isbn)
+    except Exception:
+        logger.exception('isbn: %s', isbn)
 
 
 def ottobib(isbn):
@@ -186,14 +191,31 @@ def ottobib(isbn):
 
 
 def oclc_sfn_cit_ref(oclc: str, date_format: str = '%Y-%m-%d') -> tuple:
-    text = request(
-        'https://www.worldcat.org/oclc/' + oclc + '?page=endnote'
-        '&client=worldcat.org-detailed_record').text
-    if '<html' in text:  # invalid OCLC number
+    return run_sync(async_oclc_sfn_cit_ref(oclc, date_format))
+
+
+async def async_oclc_sfn_cit_ref(
+    oclc: str, date_format: str = '%Y-%m-%d'
+) -> tuple:
+    d = await oclc_dict(oclc)
+    if d is None:
         return (
             'Error processing OCLC number: ' + oclc,
             'Perhaps you entered an invalid OCLC number?',
             '')
+    d['date_format'] = date_format
+    return dict_to_sfn_cit_ref(d)
+
+
+@cached_dict(30 * DAY)
+async def oclc_dict(oclc: str) -> Optional[dict]:
+    """Return the dictionary of the given OCLC number or None if invalid."""
+    text = (await in_executor(
+        request,
+        'https://www.worldcat.org/oclc/' + oclc + '?page=endnote'
+        '&client=worldcat.org-detailed_record')).text
+    if '<html' in text:  # invalid OCLC number
+        return None
     d = ris_parse(text)
     authors = d['authors']
     if authors:
@@ -202,10 +224,9 @@ def oclc_sfn_cit_ref(oclc: str, date_format: str = '%Y-%m-%d') -> tuple:
             fn.rstrip('.') if not fn.isupper() else fn,
             ln.rstrip('.') if not ln.isupper() else ln,
         ) for fn, ln in authors]
-    d['date_format'] = date_format
     d['oclc'] = oclc
     d['title'] = d['title'].rstrip('.')
-    return dict_to_sfn_cit_ref(d)
+    return d
 
 
 logger = getLogger(__name__)
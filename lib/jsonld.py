@@ -0,0 +1,150 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Extract citation data from the JSON-LD (schema.org) blocks of a page.
+
+It is used in urls.py.
+"""
+
+
+from html import unescape as html_unescape
+from json import loads as json_loads
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from regex import VERBOSE, IGNORECASE
+
+from lib.commons import find_any_date
+from lib.regex_timeout import timed_compile
+from lib.urls_authors import byline_to_names
+
+
+SCRIPT_FINDITER = timed_compile(
+    rb'''
+    <script\b[^>]*?\btype\s*+=\s*+["']?application/ld\+json\b[^>]*+>
+    (?<json>[^<]*+(?>(?!</script)<[^<]*+)*+)
+    </script\s*+>
+    ''',
+    VERBOSE | IGNORECASE,
+).finditer
+
+# schema.org types that describe the cited document, the preferred first.
+ARTICLE_TYPES = {
+    'NewsArticle': 0, 'ReportageNewsArticle': 0, 'AnalysisNewsArticle': 0,
+    'OpinionNewsArticle': 0, 'BackgroundNewsArticle': 0,
+    'ScholarlyArticle': 0, 'Article': 0, 'BlogPosting': 0,
+    'LiveBlogPosting': 0, 'TechArticle': 0, 'Report': 0,
+    'WebPage': 1,
+}
+PERIODICAL_TYPES = {'Periodical', 'PublicationVolume', 'PublicationIssue'}
+
+
+def types(node: dict) -> List[str]:
+    type_ = node.get('@type')
+    if not isinstance(type_, list):
+        type_ = [type_]
+    return [t for t in type_ if isinstance(t, str)]
+
+
+def nodes(data: Any) -> Iterator[dict]:
+    """Yield the top-level nodes of a parsed JSON-LD block."""
+    if isinstance(data, list):
+        for item in data:
+            yield from nodes(item)
+    elif isinstance(data, dict):
+        graph = data.get('@graph')
+        if isinstance(graph, list):
+            yield from nodes(graph)
+        else:
+            yield data
+
+
+def find_article(html: bytes, encoding: str) -> Optional[dict]:
+    """Return the JSON-LD node that describes the document itself."""
+    best = None
+    for match in SCRIPT_FINDITER(html):
+        try:
+            data = json_loads(match['json'].decode(encoding), strict=False)
+        except ValueError:
+            continue
+        for node in nodes(data):
+            rank = min(
+                (ARTICLE_TYPES.get(t, 2) for t in types(node)), default=2)
+            if rank == 0:
+                return node
+            if rank == 1 and best is None:
+                best = node
+    return best
+
+
+def name_of(value: Any) -> Optional[str]:
+    """Return the name of a Thing or a string value."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name')
+    if isinstance(value, str) and value.strip():
+        return html_unescape(value.strip())
+    return None
+
+
+def find_jsonld_authors(node: dict) -> Optional[List[Tuple[str, str]]]:
+    authors = node.get('author') or node.get('creator')
+    if not isinstance(authors, list):
+        authors = [authors]
+    names = []
+    for author in authors:
+        if isinstance(author, dict):
+            if 'Organization' in types(author):
+                continue
+            given, family = author.get('givenName'), author.get('familyName')
+            if isinstance(given, str) and isinstance(family, str):
+                names.append((given, family))
+                continue
+        name = name_of(author)
+        if name:
+            names.extend(byline_to_names(name) or ())
+    return names or None
+
+
+def find_jsonld(
+    html: Union[str, bytes], encoding: str = 'utf-8'
+) -> Dict[str, Any]:
+    """Return the citation data found in the JSON-LD blocks of html.
+
+    html may be the content of a lib.urls.Page and encoding its encoding.
+    The keys of the returned dict may be title, date, authors, website and
+    journal. The dict is empty if the page does not describe itself.
+    """
+    if isinstance(html, str):
+        html, encoding = html.encode(), 'utf-8'
+    node = find_article(html, encoding)
+    if node is None:
+        return {}
+    d = {}
+    title = name_of(node.get('headline')) or name_of(node)
+    if title:
+        d['title'] = title
+    date = node.get('datePublished') or node.get('dateCreated')
+    if isinstance(date, str):
+        date = find_any_date(date)
+        if date:
+            d['date'] = date
+    authors = find_jsonld_authors(node)
+    if authors:
+        d['authors'] = authors
+    website = name_of(node.get('publisher'))
+    if website:
+        d['website'] = website
+    # e.g. ScholarlyArticle -> PublicationIssue -> Periodical
+    part_of = node.get('isPartOf')
+    while isinstance(part_of, dict):
+        name = name_of(part_of)
+        if PERIODICAL_TYPES.intersection(types(part_of)):
+            if name:
+                d['journal'] = name
+                break
+        elif name:
+            d.setdefault('website', name)
+            break
+        part_of = part_of.get('isPartOf')
+    return d
@@ -12,8 +12,9 @@ from regex import compile as regex_compile
 from requests import RequestException
 from mechanicalsoup import StatefulBrowser
 
+from lib.cache import cached_dict, DAY
 from lib.commons import first_last, dict_to_sfn_cit_ref, request, USER_AGENT,\
-    LANG
+    LANG, in_executor, run_sync
 
 
 ISBN_SEARCH = regex_compile(r'ISBN: </b> ([-\d]++)').search
@@ -30,14 +31,28 @@ LOCATION_SEARCH = regex_compile(r'محل نشر:</b>([^<]++)<').search
 
 def ketabir_sfn_cit_ref(url: str, date_format='%Y-%m-%d') -> tuple:
     """Return the response namedtuple."""
-    dictionary = url2dictionary(url)
+    return run_sync(async_ketabir_sfn_cit_ref(url, date_format))
+
+
+async def async_ketabir_sfn_cit_ref(
+    url: str, date_format='%Y-%m-%d'
+) -> tuple:
+    """Return the response namedtuple."""
+    dictionary = await ketabir_dict(url)
     dictionary['date_format'] = date_format
-    if 'language' not in dictionary:
+    return dict_to_sfn_cit_ref(dictionary)
+
+
+@cached_dict(30 * DAY)
+async def ketabir_dict(url: str) -> Optional[dict]:
+    """Return the dictionary of the given ketab.ir URL."""
+    dictionary = await in_executor(url2dictionary, url)
+    if dictionary is not None and 'language' not in dictionary:
         # Assume that language is either fa or en.
         # Todo: give warning about this assumption?
         dictionary['language'] = \
             classify(dictionary['title'])[0]
-    return dict_to_sfn_cit_ref(dictionary)
+    return dictionary
 
 
 def isbn2url(isbn: str) -> Optional[str]:
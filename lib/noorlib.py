@@ -5,7 +5,8 @@
 
 from regex import compile as regex_compile
 
-from lib.commons import dict_to_sfn_cit_ref, request
+from lib.cache import cached_dict, DAY
+from lib.commons import dict_to_sfn_cit_ref, request, in_executor, run_sync
 from lib.bibtex import parse as bibtex_parse
 
 
@@ -16,11 +17,24 @@ RIS_ARTICLE_ID_SEARCH = regex_compile(r'(?<=RIS&id=)\d+').search
 
 def noorlib_sfn_cit_ref(url: str, date_format: str = '%Y-%m-%d') -> tuple:
     """Create the response namedtuple."""
-    dictionary = bibtex_parse(get_bibtex(url))
+    return run_sync(async_noorlib_sfn_cit_ref(url, date_format))
+
+
+async def async_noorlib_sfn_cit_ref(
+    url: str, date_format: str = '%Y-%m-%d'
+) -> tuple:
+    """Create the response namedtuple."""
+    dictionary = await noorlib_dict(url)
     dictionary['date_format'] = date_format
+    return dict_to_sfn_cit_ref(dictionary)
+
+
+@cached_dict(30 * DAY)
+async def noorlib_dict(url: str) -> dict:
+    """Return the dictionary of the given noorlib URL."""
     # risr = get_ris(url)[1]
     # dictionary = risr.parse(ris)[1]
-    return dict_to_sfn_cit_ref(dictionary)
+    return bibtex_parse(await in_executor(get_bibtex, url))
 
 
 def get_bibtex(noorlib_url):
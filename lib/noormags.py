@@ -3,11 +3,13 @@
 
 """Codes specifically related to Noormags website."""
 
-from threading import Thread
+from asyncio import gather
+from logging import getLogger
 
 from regex import compile as regex_compile
 
-from lib.commons import dict_to_sfn_cit_ref, request
+from lib.cache import cached_dict, DAY
+from lib.commons import dict_to_sfn_cit_ref, request, in_executor, run_sync
 from lib.bibtex import parse as bibtex_parse
 from lib.ris import parse as ris_parse
 
@@ -18,42 +20,68 @@ RIS_ARTICLE_ID_SEARCH = regex_compile(r'(?<=/citation/ris/)\d+').search
 
 def noormags_sfn_cit_ref(url: str, date_format: str = '%Y-%m-%d') -> tuple:
     """Create the response namedtuple."""
-    ris_collection = {}
-    ris_thread = Thread(target=ris_fetcher_thread, args=(url, ris_collection))
-    ris_thread.start()
-    dictionary = bibtex_parse(get_bibtex(url))
+    return run_sync(async_noormags_sfn_cit_ref(url, date_format))
+
+
+async def async_noormags_sfn_cit_ref(
+    url: str, date_format: str = '%Y-%m-%d'
+) -> tuple:
+    """Create the response namedtuple."""
+    dictionary = await noormags_dict(url)
     dictionary['date_format'] = date_format
+    return dict_to_sfn_cit_ref(dictionary)
+
+
+@cached_dict(30 * DAY)
+async def noormags_dict(url: str) -> dict:
+    """Return the dictionary of the given noormags URL."""
+    # The article page is shared between the bibtex and ris lookups.
+    page_text = (await in_executor(request, url)).text
+    bibtex, ris_collection = await gather(
+        in_executor(get_bibtex, page_text),
+        in_executor(ris_fetcher, page_text))
+    dictionary = bibtex_parse(bibtex)
     # language parameter needs to be taken from RIS
     # other information are more accurate in bibtex
     # for example: http://www.noormags.ir/view/fa/articlepage/104040
     # "IS  - 1" is wrong in RIS but "number = { 45 }," is correct in bibtex
-    ris_thread.join()
     dictionary.update(ris_collection)
-    return dict_to_sfn_cit_ref(dictionary)
+    return dictionary
 
 
-def get_bibtex(noormags_url):
-    """Get BibTex file content from a noormags_url. Return as string."""
-    page_text = request(noormags_url).text
+def get_bibtex(page_text):
+    """Get BibTex file content from a noormags page. Return as string."""
     article_id = BIBTEX_ARTICLE_ID_SEARCH(page_text)[0]
     url = 'http://www.noormags.ir/view/fa/citation/bibtex/' + article_id
     return request(url).text
 
 
-def get_ris(noormags_url):
-    """Get ris file content from a noormags url. Return as string."""
-    page_text = request(noormags_url).text
+def get_ris(page_text):
+    """Get ris file content from a noormags page. Return as string."""
     article_id = RIS_ARTICLE_ID_SEARCH(page_text)[0]
     return request(
         'http://www.noormags.ir/view/fa/citation/ris/' + article_id).text
 
 
-def ris_fetcher_thread(url, ris_collection):
-    """Fill the ris_dict. This function is called in a thread."""
-    ris_dict = ris_parse(get_ris(url))
+def ris_fetcher(page_text) -> dict:
+    """Return the language and authors found in the RIS of the page.
+
+    Return an empty dict if the RIS could not be retrieved.
+    """
+    ris_collection = {}
+    # noinspection PyBroadException
+    try:
+        ris_dict = ris_parse(get_ris(page_text))
+    except Exception:
+        logger.exception('Could not get the RIS of noormags page.')
+        return ris_collection
     language = ris_dict.get('language')
     if language:
         ris_collection['language'] = language
     authors = ris_dict.get('authors')
     if authors:
         ris_collection['authors'] = authors
+    return ris_collection
+
+
+logger = getLogger(__name__)
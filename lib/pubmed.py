@@ -7,11 +7,14 @@ from collections import defaultdict
 from config import NCBI_API_KEY, NCBI_EMAIL, NCBI_TOOL
 from datetime import datetime
 from logging import getLogger
-from threading import Thread
 
 from regex import compile as regex_compile
 
-from lib.commons import dict_to_sfn_cit_ref, b_TO_NUM, request
+from lib.cache import cached_dict, DAY
+from lib.commons import (
+    dict_to_sfn_cit_ref, b_TO_NUM, request, in_executor, run_sync,
+    RateLimitError)
+from lib.deadline import optional
 from lib.doi import get_crossref_dict
 
 NON_DIGITS_SUB = regex_compile(r'[^\d]').sub
@@ -30,33 +33,48 @@ class NCBIError(Exception):
 
 
 def pmid_sfn_cit_ref(pmid: str, date_format='%Y-%m-%d') -> tuple:
+    """Return the response namedtuple."""
+    return run_sync(async_pmid_sfn_cit_ref(pmid, date_format))
+
+
+async def async_pmid_sfn_cit_ref(pmid: str, date_format='%Y-%m-%d') -> tuple:
     """Return the response namedtuple."""
     pmid = NON_DIGITS_SUB('', pmid)
-    dictionary = ncbi('pmid', pmid)
+    dictionary = await ncbi('pmid', pmid)
     dictionary['date_format'] = date_format
     return dict_to_sfn_cit_ref(dictionary)
 
 
 def pmcid_sfn_cit_ref(pmcid: str, date_format='%Y-%m-%d') -> tuple:
+    """Return the response namedtuple."""
+    return run_sync(async_pmcid_sfn_cit_ref(pmcid, date_format))
+
+
+async def async_pmcid_sfn_cit_ref(
+    pmcid: str, date_format='%Y-%m-%d'
+) -> tuple:
     """Return the response namedtuple."""
     pmcid = NON_DIGITS_SUB('', pmcid)
-    dictionary = ncbi('pmcid', pmcid)
+    dictionary = await ncbi('pmcid', pmcid)
     dictionary['date_format'] = date_format
     return dict_to_sfn_cit_ref(dictionary)
 
 
-def ncbi(type_: str, id_: str) -> defaultdict:
+@cached_dict(30 * DAY)
+async def ncbi(type_: str, id_: str) -> defaultdict:
     """Return the NCBI data for the given id_."""
     # According to https://www.ncbi.nlm.nih.gov/pmc/tools/get-metadata/
     if type_ == 'pmid':
-        json_response = request(PUBMED_URL + id_).json()
+        json_response = (await in_executor(request, PUBMED_URL + id_)).json()
     else:  # type_ == 'pmcid'
-        json_response = request(PMC_URL + id_).json()
+        json_response = (await in_executor(request, PMC_URL + id_)).json()
     if 'error' in json_response:
         # Example error message if rates are exceeded:
         # {"error":"API rate limit exceeded","count":"11"}
         # https://www.ncbi.nlm.nih.gov/books/NBK25497/#chapter2.Coming_in_May_2018_API_Keys
-        # Return a 503 Service Unavailable
+        if 'rate limit' in json_response['error']:
+            # app.py returns a 503 Service Unavailable
+            raise RateLimitError(json_response['error'])
         raise NCBIError(json_response)
     result_get = json_response['result'][id_].get
     d = defaultdict(lambda: None)
@@ -68,9 +86,8 @@ def ncbi(type_: str, id_: str) -> defaultdict:
         if idtype == 'doi':
             doi = articleid['value']
             crossref_dict = {}
-            crossref_thread = Thread(
-                target=crossref_update, args=(crossref_dict, doi))
-            crossref_thread.start()
+            crossref_future = in_executor(
+                crossref_update, crossref_dict, doi)
             d['doi'] = doi
         elif idtype == 'pmcid':
             # Use NON_DIGITS_SUB to remove the PMC prefix e.g. in PMC3539452
@@ -133,9 +150,12 @@ def ncbi(type_: str, id_: str) -> defaultdict:
 
     if doi:
         # noinspection PyUnboundLocalVariable
-        crossref_thread.join()
-        # noinspection PyUnboundLocalVariable
-        d.update(crossref_dict)
+        await optional(crossref_future)
+        if crossref_future.done():
+            # noinspection PyUnboundLocalVariable
+            d.update(crossref_dict)
+        else:  # The deadline has passed.
+            crossref_future.cancel()
 
     return d
 
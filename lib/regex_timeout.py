@@ -0,0 +1,109 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Regular expressions with a time budget.
+
+The patterns of the url extractors run on arbitrary pages of up to
+MAX_RESPONSE_LENGTH bytes. A pattern compiled with timed_compile gives up
+after REGEX_TIMEOUT seconds and returns what a failed match would return,
+e.g. None for search or the unchanged string for sub. The pattern and the
+url being processed (CURRENT_URL) are logged and the deadline of the user
+request is marked as degraded, so the incomplete result is not cached.
+"""
+
+from contextvars import ContextVar
+from logging import getLogger
+from typing import Iterator
+
+from regex import compile as regex_compile
+
+from lib.deadline import DEADLINE
+
+
+# Maximum time of each search, match, sub, etc. (in seconds).
+REGEX_TIMEOUT = .5
+
+# The url whose page is being processed. It is only used for logging.
+CURRENT_URL = ContextVar('CURRENT_URL', default=None)
+
+
+class TimedPattern:
+
+    """A wrapper of a compiled pattern that applies REGEX_TIMEOUT."""
+
+    __slots__ = 'pattern'
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def timed_out(self) -> None:
+        logger.warning(
+            'regex timed out on %s: %.200r', CURRENT_URL.get(),
+            self.pattern.pattern)
+        deadline = DEADLINE.get()
+        if deadline is not None:
+            deadline.degraded = True
+
+    def search(self, string, *args, **kwargs):
+        try:
+            return self.pattern.search(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return None
+
+    def match(self, string, *args, **kwargs):
+        try:
+            return self.pattern.match(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return None
+
+    def fullmatch(self, string, *args, **kwargs):
+        try:
+            return self.pattern.fullmatch(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return None
+
+    def findall(self, string, *args, **kwargs) -> list:
+        try:
+            return self.pattern.findall(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return []
+
+    def finditer(self, string, *args, **kwargs) -> Iterator:
+        """Yield the matches that were found before the timeout."""
+        try:
+            yield from self.pattern.finditer(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+
+    def sub(self, repl, string, *args, **kwargs):
+        try:
+            return self.pattern.sub(
+                repl, string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return string
+
+    def split(self, string, *args, **kwargs) -> list:
+        try:
+            return self.pattern.split(
+                string, *args, timeout=REGEX_TIMEOUT, **kwargs)
+        except TimeoutError:
+            self.timed_out()
+            return [string]
+
+
+def timed_compile(pattern, flags: int = 0) -> TimedPattern:
+    """Compile pattern into a TimedPattern."""
+    return TimedPattern(regex_compile(pattern, flags))
+
+
+logger = getLogger(__name__)
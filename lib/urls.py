@@ -4,54 +4,117 @@
 """Codes used for parsing contents of an arbitrary URL."""
 
 
+from asyncio import (
+    ensure_future, get_running_loop, wait_for, Future,
+    TimeoutError as AsyncioTimeoutError)
+from codecs import lookup as codec_lookup
 from collections import defaultdict
+from contextvars import ContextVar
 from datetime import date as datetime_date
-from difflib import get_close_matches
+from functools import lru_cache
 from html import unescape as html_unescape
+from itertools import chain
 from logging import getLogger
-from threading import Thread
-from typing import Optional, List, Dict, Any, Tuple
+from threading import Event
+from typing import (
+    Optional, List, Dict, Any, Tuple, Awaitable, Iterator, Union, FrozenSet)
 from urllib.parse import urlparse
 
-from langid import classify
-from regex import compile as regex_compile, VERBOSE, IGNORECASE
+from regex import VERBOSE, IGNORECASE
 from requests import Response as RequestsResponse
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, Timeout
 
+from lib.cache import cached_dict, TwoTierCache, MISSING, HOUR, DAY
+from lib.charset import decode_content, header_charset, sniff_encoding
 from lib.commons import (
-    find_any_date, dict_to_sfn_cit_ref, ANYDATE_PATTERN,
-    request)
-from lib.urls_authors import find_authors, CONTENT_ATTR
+    find_any_date, dict_to_sfn_cit_ref, ANYDATE_PATTERN, ANYDATE_SEARCH,
+    request, in_executor, run_sync, single_flight, coalesce, RateLimitError)
+from lib.deadline import optional, remaining_time, is_degraded, DEADLINE
+from lib.doi import doi_dict
+from lib.jsonld import find_jsonld
+from lib.regex_timeout import timed_compile, CURRENT_URL
+from lib.urls_authors import (
+    find_meta_authors, find_byline_authors, byline_to_names)
+from lib.urls_language import find_language
+from lib.urls_profiles import find_profile, Profile
+from config import CROSSREF_UPGRADE, CROSSREF_BUDGET, HEAD_SCOPED_META
 
 
 MAX_RESPONSE_LENGTH = 2000000
-
-# https://stackoverflow.com/questions/3458217/how-to-use-regular-expression-to-match-the-charset-string-in-html
-CHARSET = regex_compile(
-    rb'''
-    <meta(?!\s*+(?>name|value)\s*+=)[^>]*?charset\s*+=[\s"']*+([^\s"'/>]*)
-    ''',
-    IGNORECASE | VERBOSE,
-).search
-
-TITLE_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])
-        (?>citation_title|title|Headline|og:title)
-    (?P=q)
-'''
-TITLE_SEARCH = regex_compile(
-    r'<meta\s++(?:'
-    + TITLE_META_NAME_OR_PROP + r'\s++' + CONTENT_ATTR
-    + '|'
-    + CONTENT_ATTR + r'\s++' + TITLE_META_NAME_OR_PROP
-    + ')'
-    '|'
-    r'class=(?<q>["\'])(?>main-hed|heading1)(?P=q)[^>]++>(?<result>[^<]*+)<',
+CHUNK_SIZE = 65536
+# Number of bytes after </head> that are downloaded even if the head contains
+# all the required metadata, e.g. for the bylines of the article.
+BODY_WINDOW = 100000
+# Called by read_html, in the thread of get_page, with the bytes of the head
+# as soon as the end of the head has been read. See CrossrefUpgrade.
+HEAD_CALLBACK = ContextVar('HEAD_CALLBACK', default=None)
+# The fields of the Crossref record of a DOI that replace those of the page.
+CROSSREF_FIELDS = (
+    'cite_type', 'title', 'container-title', 'authors', 'editors',
+    'translators', 'volume', 'issue', 'page', 'issn', 'isbn', 'publisher',
+    'publisher-location')
+
+# Home page titles are cached per scheme and netloc (in seconds).
+HOME_TITLE_TTL = DAY
+HOME_TITLE_FAILURE_TTL = 600
+HOME_TITLE_CACHE = TwoTierCache('home_titles')
+# The home page is only fetched when its title is needed. Set this to a
+# number of seconds to also start the fetch that long after the page of the
+# url is requested, as a head start for slow pages.
+HOME_TITLE_HEAD_START = None
+
+# The tokenizer of MetaIndex. Quoted attribute values may contain '>'.
+# The markup-level patterns run on the bytes of the page, see Page.
+META_TAG_FINDITER = timed_compile(
+    rb"""
+    <meta\s++
+    (?<attrs>(?>[^>"']++|"[^"]*+"|'[^']*+')*+)
+    >
+    """,
     VERBOSE | IGNORECASE,
+).finditer
+META_ATTR_FINDALL = timed_compile(
+    rb"""
+    ([\w:.-]++)\s*+=\s*+
+    (?>"([^"]*+)"|'([^']*+)'|([^\s"'>]++))
+    """,
+    VERBOSE,
+).findall
+
+# Names (or properties) of meta tags, in lower case.
+TITLE_META_NAMES = 'citation_title', 'title', 'headline', 'og:title'
+JOURNAL_META_NAMES = 'citation_journal_title',
+URL_META_NAMES = 'og:url',
+ISSN_META_NAMES = 'citation_issn',
+PMID_META_NAMES = 'citation_pmid',
+DOI_META_NAMES = 'citation_doi',
+VOLUME_META_NAMES = 'citation_volume',
+ISSUE_META_NAMES = 'citation_issue',
+FIRST_PAGE_META_NAMES = 'citation_firstpage',
+LAST_PAGE_META_NAMES = 'citation_lastpage',
+SITE_NAME_META_NAMES = 'og:site_name',
+DATE_META_NAME_FULLMATCH = timed_compile(
+    r"""
+    article:(?>modified_time|published_time)
+    |citation_(?>date|publication_date)
+    |date
+    |dc.date.[^'"\n>]*+
+    |last-modified
+    |pub_?date
+    |sailthru\.date
+    """,
+    VERBOSE,
+).fullmatch
+
+TITLE_CLASS_SEARCH = timed_compile(
+    r'class=(?<q>["\'])(?>main-hed|heading1)(?P=q)[^>]++>(?<result>[^<]*+)<',
+    IGNORECASE,
 ).search
 
-TITLE_TAG = regex_compile(
-    r'''
+HEAD_END = timed_compile(rb'</head\s*+>', IGNORECASE).search
+
+TITLE_TAG = timed_compile(
+    rb'''
     <title\b[^>]*+>
         (?P<result>[^<]*+[\s\S]*?)
     </title\s*+>
@@ -59,183 +122,161 @@ TITLE_TAG = regex_compile(
     VERBOSE | IGNORECASE,
 ).search
 
-DATE_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])(?>
-        article:(?>modified_time|published_time)
-        |citation_(?>date|publication_date)
-        |date
-        |DC.date.[^'"\n>]*+
-        |last-modified
-        |pub_?date
-        |sailthru\.date
-    )(?P=q)
-'''
-DATE_CONTENT_ATTR =\
-    r'content=(?<q>["\'])[^"\'<]*?' + ANYDATE_PATTERN + r'[^"\'<]*+(?P=q)'
-DATE_SEARCH = regex_compile(
-    r'<meta\s+[^\n<]*?(?:'
-    + DATE_META_NAME_OR_PROP + r'\s++[^\n<]*?' + DATE_CONTENT_ATTR
-    + '|'
-    + DATE_CONTENT_ATTR + r'\s++[^\n<]*?' + DATE_META_NAME_OR_PROP
-    + ')'
-    '|'
-    # http://livescience.com/46619-sterile-neutrino-experiment-beginning.html
-    # https://www.thetimes.co.uk/article/woman-who-lost-brother-on-mh370-mourns-relatives-on-board-mh17-r07q5rwppl0
+DATE_CONTENT_SEARCH = timed_compile(
+    ANYDATE_PATTERN, VERBOSE | IGNORECASE).search
+# http://livescience.com/46619-sterile-neutrino-experiment-beginning.html
+# https://www.thetimes.co.uk/article/woman-who-lost-brother-on-mh370-mourns-relatives-on-board-mh17-r07q5rwppl0
+DATE_TEXT_SEARCH = timed_compile(
     r'date(?>Published|line)[^\w]++' + ANYDATE_PATTERN,
     VERBOSE | IGNORECASE,
 ).search
 
-JOURNAL_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_journal_title(?P=q)
-'''
-JOURNAL_TITLE_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + JOURNAL_META_NAME_OR_PROP
-    + '|'
-    + JOURNAL_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+TITLE_SPLIT = timed_compile(r' - | — |\|').split
+# The minimum similarity of a title part that is taken as the site name.
+# Cutoff = 0.15: the 'BBC' part of 'BBC - Homepage' will match u'‭BBC ‮فارسی‬'
+SIMILARITY_CUTOFF = .15
 
-URL_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])og:url(?P=q)
-'''
-URL_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + URL_META_NAME_OR_PROP
-    + '|'
-    + URL_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+# The regions of scan_date.
+TIME_DATETIME_FINDITER = timed_compile(
+    rb'''<time\b[^>]*?\bdatetime\s*+=\s*+["']?(?<result>[^"'>]++)''',
+    IGNORECASE,
+).finditer
+BODY_START_SEARCH = timed_compile(r'<body\b[^>]*+>', IGNORECASE).search
+DATE_ANCHOR_SEARCH = timed_compile(r'<h1\b|byline', IGNORECASE).search
+# Number of characters after the first h1 or byline that are scanned.
+ANCHOR_DATE_WINDOW = 5000
+# Number of characters at the beginning of the body that are scanned.
+BODY_DATE_WINDOW = 100000
 
-ISSN_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_issn(?P=q)
-'''
-ISSN_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + ISSN_META_NAME_OR_PROP
-    + '|'
-    + ISSN_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
 
-PMID_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_pmid(?P=q)
-'''
-PMID_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + PMID_META_NAME_OR_PROP
-    + '|'
-    + PMID_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+class ContentTypeError(ValueError):
 
-DOI_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_doi(?P=q)
-'''
-DOI_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + DOI_META_NAME_OR_PROP
-    + '|'
-    + DOI_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+    """Raise when content-type header does not start with 'text/'."""
 
+    pass
 
-VOLUME_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_volume(?P=q)
-'''
-VOLUME_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + VOLUME_META_NAME_OR_PROP
-    + '|'
-    + VOLUME_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
 
-ISSUE_META_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_issue(?P=q)
-'''
-ISSUE_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + ISSUE_META_NAME_OR_PROP
-    + '|'
-    + ISSUE_META_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+class ContentLengthError(ValueError):
 
-FIRST_PAGE_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_firstpage(?P=q)
-'''
-FIRST_PAGE_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + FIRST_PAGE_NAME_OR_PROP
-    + '|'
-    + FIRST_PAGE_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+    """Raise when content-length header indicates a very long content."""
 
+    pass
 
-LAST_PAGE_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])citation_lastpage(?P=q)
-'''
-LAST_PAGE_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + LAST_PAGE_NAME_OR_PROP
-    + '|'
-    + LAST_PAGE_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
 
+class StatusCodeError(ValueError):
 
-SITE_NAME_NAME_OR_PROP = r'''
-    (?>name|property)=(?<q>["\'])og:site_name(?P=q)
-'''
-SITE_NAME_SEARCH = regex_compile(
-    r'<meta\s++[^\n<]*?(?:'
-    + CONTENT_ATTR + r'\s++[^\n<]*?' + SITE_NAME_NAME_OR_PROP
-    + '|'
-    + SITE_NAME_NAME_OR_PROP + r'\s++[^\n<]*?' + CONTENT_ATTR
-    + ')',
-    VERBOSE | IGNORECASE,
-).search
+    """Raise when status_code != 200."""
 
-TITLE_SPLIT = regex_compile(r' - | — |\|').split
+    pass
 
 
-class ContentTypeError(ValueError):
+class FetchCancelled(Exception):
 
-    """Raise when content-type header does not start with 'text/'."""
+    """Raise when the cancelled event of a fetch is set."""
 
     pass
 
 
-class ContentLengthError(ValueError):
+class Page:
 
-    """Raise when content-length header indicates a very long content."""
+    """The content of an html page and its encoding.
 
-    pass
+    The markup-level patterns, e.g. those of MetaIndex, run on content and
+    only decode what they capture. The whole text of the page, html, is
+    decoded when it is first needed, i.e. when a text heuristic runs.
+    The encoding of a response is found by response_page.
+    """
 
+    __slots__ = 'content', 'encoding', '_html'
 
-class StatusCodeError(ValueError):
+    def __init__(self, content: bytes, encoding: str):
+        encoding = codec_lookup(encoding).name
+        self._html = None
+        if '<>'.encode(encoding) != b'<>':  # e.g. UTF-16
+            self._html = decode_content(content, encoding)
+            content, encoding = self._html.encode(), 'utf-8'
+        self.content = content
+        self.encoding = encoding
 
-    """Raise when status_code != 200."""
+    @property
+    def html(self) -> str:
+        if self._html is None:
+            self._html = decode_content(self.content, self.encoding)
+        return self._html
 
-    pass
+
+def response_page(r: RequestsResponse, content: bytes) -> Page:
+    """Return the Page of content, the body (or a part of it) of r."""
+    return Page(content, sniff_encoding(
+        content, header_charset(r.headers.get('content-type')),
+        urlparse(r.url).hostname))
+
+
+class MetaIndex(dict):
+
+    """Map the names, properties and http-equivs of meta tags to contents.
+
+    The html is tokenized in a single pass. Keys are lower-cased and values
+    are lists of (position, content) pairs in document order. Meta tags with
+    an empty content are ignored. html may be the content of a Page and
+    encoding its encoding; only the captured values are decoded. The meta
+    tags of the body, which some pages have, are indexed too.
+
+    If head_only is True, only the meta tags before </head> are indexed,
+    unless the document has no </head> or its head has no meta tags. This
+    saves the scan of the body, which is usually much larger, but loses the
+    meta tags of the body of pages that also have some in their head.
+    """
+
+    def __init__(
+        self, html: Union[str, bytes], encoding: str = 'utf-8',
+        head_only: bool = False,
+    ):
+        super().__init__()
+        if isinstance(html, str):
+            html, encoding = html.encode(), 'utf-8'
+        if head_only:
+            m = HEAD_END(html)
+            if m is not None:
+                self._index(html, m.start(), encoding)
+                if self:
+                    return
+        self._index(html, len(html), encoding)
+
+    def _index(self, html: bytes, end: int, encoding: str) -> None:
+        for m in META_TAG_FINDITER(html, 0, end):
+            names = []
+            value = None
+            for attr, *values in META_ATTR_FINDALL(m['attrs']):
+                attr = attr.lower()
+                if attr == b'content':
+                    value = b''.join(values)
+                elif attr in (b'name', b'property', b'http-equiv'):
+                    names.append(b''.join(values).decode('latin-1').lower())
+            if value:
+                entry = m.start(), value.decode(encoding, 'replace')
+                for name in names:
+                    self.setdefault(name, []).append(entry)
+
+    def first(self, names: Tuple[str, ...]) -> Optional[str]:
+        """Return the content of the first meta tag having one of names."""
+        entries = [e for name in names for e in self.get(name, ())]
+        if entries:
+            return min(entries)[1]
+        return None
 
 
 def urls_sfn_cit_ref(url: str, date_format: str = '%Y-%m-%d') -> tuple:
+    """Create the response namedtuple."""
+    return run_sync(async_urls_sfn_cit_ref(url, date_format))
+
+
+async def async_urls_sfn_cit_ref(
+    url: str, date_format: str = '%Y-%m-%d'
+) -> tuple:
     """Create the response namedtuple."""
     try:
-        dictionary = url2dict(url)
+        dictionary = await url2dict(url)
     except (ContentTypeError, ContentLengthError) as e:
         logger.exception(url)
         # Todo: i18n
@@ -244,122 +285,108 @@ def urls_sfn_cit_ref(url: str, date_format: str = '%Y-%m-%d') -> tuple:
     return dict_to_sfn_cit_ref(dictionary)
 
 
-def find_journal(html: str) -> Optional[str]:
+def find_journal(meta: MetaIndex) -> Optional[str]:
     """Return journal title as a string."""
     # http://socialhistory.ihcs.ac.ir/article_319_84.html
-    m = JOURNAL_TITLE_SEARCH(html)
-    if m:
-        return m['result']
+    return meta.first(JOURNAL_META_NAMES)
 
 
-def find_url(html: str, url: str) -> str:
+def find_url(meta: MetaIndex, url: str) -> str:
     """Return og:url or url as a string."""
     # http://www.ft.com/cms/s/836f1b0e-f07c-11e3-b112-00144feabdc0,Authorised=false.html?_i_location=http%3A%2F%2Fwww.ft.com%2Fcms%2Fs%2F0%2F836f1b0e-f07c-11e3-b112-00144feabdc0.html%3Fsiteedition%3Duk&siteedition=uk&_i_referer=http%3A%2F%2Fwww.ft.com%2Fhome%2Fuk
-    m = URL_SEARCH(html)
-    if m:
-        ogurl = m['result']
-        if urlparse(ogurl).path:
-            return ogurl
+    ogurl = meta.first(URL_META_NAMES)
+    if ogurl and urlparse(ogurl).path:
+        return ogurl
     return url
 
 
-def find_issn(html: str) -> Optional[str]:
+def find_issn(meta: MetaIndex) -> Optional[str]:
     r"""Return International Standard Serial Number as a string.
 
     Normally ISSN should be in the  '\d{4}\-\d{3}[\dX]' format, but this
     function does not check that.
     """
-    m = ISSN_SEARCH(html)
     # http://socialhistory.ihcs.ac.ir/article_319_84.html
     # http://psycnet.apa.org/journals/edu/30/9/641/
-    if m:
-        return m['result']
+    return meta.first(ISSN_META_NAMES)
 
 
-def find_pmid(html: str) -> Optional[str]:
+def find_pmid(meta: MetaIndex) -> Optional[str]:
     """Return pmid as a string."""
     # http://jn.physiology.org/content/81/1/319
-    m = PMID_SEARCH(html)
-    if m:
-        return m['result']
+    return meta.first(PMID_META_NAMES)
 
 
-def find_doi(html: str) -> Optional[str]:
+def find_doi(meta: MetaIndex) -> Optional[str]:
     """Return DOI as a string."""
     # http://jn.physiology.org/content/81/1/319
-    m = DOI_SEARCH(html)
-    if m:
-        return m['result']
+    return meta.first(DOI_META_NAMES)
 
 
-def find_volume(html: str) -> Optional[str]:
+def find_volume(meta: MetaIndex) -> Optional[str]:
     """Return citatoin volume number as a string."""
     # http://socialhistory.ihcs.ac.ir/article_319_84.html
-    m = VOLUME_SEARCH(html)
-    if m:
-        return m['result']
+    return meta.first(VOLUME_META_NAMES)
 
 
-def find_issue(html: str) -> Optional[str]:
+def find_issue(meta: MetaIndex) -> Optional[str]:
     """Return citation issue number as a string."""
     # http://socialhistory.ihcs.ac.ir/article_319_84.html
-    m = ISSUE_SEARCH(html)
-    if m:
-        return m['result']
+    return meta.first(ISSUE_META_NAMES)
 
 
-def find_pages(html: str) -> Optional[str]:
+def find_pages(meta: MetaIndex) -> Optional[str]:
     """Return citation pages as a string."""
     # http://socialhistory.ihcs.ac.ir/article_319_84.html
-    fp_match = FIRST_PAGE_SEARCH(html)
-    if fp_match:
-        lp_match = LAST_PAGE_SEARCH(html)
-        if lp_match:
-            return \
-                fp_match['result'] + '–' + lp_match['result']
+    first_page = meta.first(FIRST_PAGE_META_NAMES)
+    if first_page:
+        last_page = meta.first(LAST_PAGE_META_NAMES)
+        if last_page:
+            return first_page + '–' + last_page
 
 
-def find_site_name(
-    html: str,
+async def find_site_name(
+    meta: MetaIndex,
     html_title: str,
     url: str,
     authors: List[Tuple[str, str]],
-    home_title: List[str],
-    thread: Thread,
+    home_title: Awaitable[Optional[str]],
+    publisher: Optional[str] = None,
 ) -> str:
     """Return (site's name as a string, where).
 
     Parameters:
-        html: The html string of the page being processed.
+        meta: The MetaIndex of the page being processed.
         html_title: Title of the page found in the title tag of the html.
         url: URL of the page.
         authors: Authors list returned from find_authors function.
-        home_title: A list containing the title of the home page as a str.
-        thread: The thread that should be joined before using home_title list.
+        home_title: An awaitable resolving to the title of the home page.
+            It is only awaited if the other methods fail.
+        publisher: The name of the publisher found in JSON-LD data.
     Returns site's name as a string.
     """
-    m = SITE_NAME_SEARCH(html)
-    if m:
-        return m['result']
+    site_name = meta.first(SITE_NAME_META_NAMES) or publisher
+    if site_name:
+        return site_name
     # search the title
-    site_name = parse_title(
-        html_title, url, authors, home_title, thread
-    )[2]
+    site_name = (await async_parse_title(
+        html_title, url, authors, home_title))[2]
     if site_name:
         return site_name
     # noinspection PyBroadException
     try:
         # using home_title
-        thread.join()
-        if ':' in home_title[0]:
-            # http://www.washingtonpost.com/wp-dyn/content/article/2005/09/02/AR2005090200822.html
-            site_name = home_title[0].split(':')[0].strip()
+        home_title = await optional(home_title)
+        if home_title:
+            if ':' in home_title:
+                # http://www.washingtonpost.com/wp-dyn/content/article/2005/09/02/AR2005090200822.html
+                site_name = home_title.split(':')[0].strip()
+                if site_name:
+                    return site_name
+            site_name = parse_title(home_title, url, None)[2]
             if site_name:
                 return site_name
-        site_name = parse_title(home_title[0], url, None)[2]
-        if site_name:
-            return site_name
-        return home_title[0]
+            return home_title
     except Exception:
         logger.exception(url)
     # return hostname
@@ -369,32 +396,64 @@ def find_site_name(
     return hostname
 
 
-def find_title(
-    html: str,
+async def find_title(
+    meta: MetaIndex,
+    page: Page,
     html_title: str,
     url: str,
     authors: List[Tuple[str, str]],
-    home_title: List[str],
-    thread: Thread,
+    home_title: Awaitable[Optional[str]],
+    headline: Optional[str] = None,
+    site_name: Optional[str] = None,
 ) -> Optional[str]:
     """Return (title_string, where_info)."""
-    m = TITLE_SEARCH(html)
-    if m:
-        return parse_title(
-            html_unescape(m['result']), url, authors, home_title, thread,
-        )[1]
+    title = meta.first(TITLE_META_NAMES) or headline
+    if title is None:
+        m = TITLE_CLASS_SEARCH(page.html)
+        if m:
+            title = m['result']
+    if title:
+        return (await async_parse_title(
+            html_unescape(title), url, authors, home_title, site_name,
+        ))[1]
     elif html_title:
-        return parse_title(html_title, url, authors, home_title, thread)[1]
+        return (await async_parse_title(
+            html_title, url, authors, home_title, site_name))[1]
     else:
         return None
 
 
+async def async_parse_title(
+    title: str,
+    url: str,
+    authors: Optional[List[Tuple[str, str]]],
+    home_title: Awaitable[Optional[str]],
+    site_name: Optional[str] = None,
+) -> Tuple[Optional[str], str, Optional[str]]:
+    """Return (intitle_author, pure_title, intitle_sitename).
+
+    Same as parse_title, but home_title is an awaitable which will only be
+    awaited if the site name could not be found using the hostname or the
+    already known site_name.
+    """
+    parsed = parse_title(title, url, authors)
+    if parsed[2] is not None or len(TITLE_SPLIT(title.strip())) == 1:
+        return parsed
+    if site_name:
+        parsed = parse_title(title, url, authors, site_name)
+        if parsed[2] is not None:
+            return parsed
+    home_title = await optional(home_title)
+    if not home_title:
+        return parsed
+    return parse_title(title, url, authors, home_title)
+
+
 def parse_title(
     title: str,
     url: str,
     authors: Optional[List[Tuple[str, str]]],
-    home_title_list: Optional[List[str]] = None,
-    thread: Thread = None,
+    home_title: Optional[str] = None,
 ) -> Tuple[Optional[str], str, Optional[str]]:
     """Return (intitle_author, pure_title, intitle_sitename).
 
@@ -420,12 +479,30 @@ def parse_title(
             None)
     (None, "Health - New teeth 'could soon be grown'", 'BBC NEWS')
 
+    """
+    return parse_title_parts(
+        title, urlparse(url).hostname, tuple(authors) if authors else None,
+        home_title)
+
+
+@lru_cache(maxsize=1024)
+def parse_title_parts(
+    title: str,
+    hostname: str,
+    authors: Optional[Tuple[Tuple[str, str], ...]],
+    home_title: Optional[str],
+) -> Tuple[Optional[str], str, Optional[str]]:
+    """Do the work of parse_title.
+
+    The results are memoized. A page title is usually parsed for both the
+    site name and the title, and the same home titles and site names recur
+    across the pages of a site.
     """
     intitle_author = intitle_sitename = None
     title_parts = TITLE_SPLIT(title.strip())
     if len(title_parts) == 1:
         return None, title, None
-    hostname = urlparse(url).hostname.replace('www.', '')
+    hostname = hostname.replace('www.', '')
     # Searching for intitle_sitename
     # 1. In hostname
     hnset = set(hostname.split('.'))
@@ -434,29 +511,22 @@ def parse_title(
             intitle_sitename = part
             break
     else:
-        # 2. Using difflib on hostname
-        # Cutoff = 0.3: 'BBC - Homepage' will match u'‭BBC ‮فارسی‬'
-        close_matches = get_close_matches(
-            hostname, title_parts, n=1, cutoff=.3
-        )
-        if close_matches:
-            intitle_sitename = close_matches[0]
-        else:
-            if thread:
-                thread.join()
-            if home_title_list:
-                home_title = home_title_list[0]
+        # 2. Using the similarity to hostname, without its top-level domain
+        intitle_sitename = closest_part(
+            [hostname.rpartition('.')[0]], title_parts)
+        if intitle_sitename is None:
+            if home_title:
                 # 3. In homepage title
                 for part in title_parts:
                     if part in home_title:
                         intitle_sitename = part
                         break
                 else:
-                    # 4. Using difflib on home_title
-                    close_matches = get_close_matches(
-                        home_title, title_parts, n=1, cutoff=.3)
-                    if close_matches:
-                        intitle_sitename = close_matches[0]
+                    # 4. Using the similarity to the parts of home_title,
+                    # e.g. to 'BBC' and not to the whole 'BBC - Homepage'
+                    intitle_sitename = closest_part(
+                        [p.strip() for p in TITLE_SPLIT(home_title)],
+                        title_parts)
     # Remove sitename from title_parts
     if intitle_sitename:
         title_parts.remove(intitle_sitename)
@@ -476,40 +546,192 @@ def parse_title(
     return intitle_author, pure_title, intitle_sitename
 
 
-def find_date(html: str, url: str) -> datetime_date:
-    """Return the date of the document."""
+@lru_cache(maxsize=4096)
+def bigrams(s: str) -> FrozenSet[str]:
+    """Return the set of the pairs of adjacent characters of lower-cased s."""
+    s = s.lower()
+    return frozenset([s[i:i + 2] for i in range(len(s) - 1)])
+
+
+@lru_cache(maxsize=4096)
+def similarity(target: str, part: str) -> float:
+    """Return the Jaccard index of the bigrams of target and part.
+
+    The results are memoized; the same hostnames, home titles and site
+    names recur across the pages of a site.
+    """
+    target_bigrams = bigrams(target)
+    part_bigrams = bigrams(part)
+    union = len(target_bigrams | part_bigrams)
+    return len(target_bigrams & part_bigrams) / union if union else 0.
+
+
+def closest_part(targets: List[str], parts: List[str]) -> Optional[str]:
+    """Return the part that is the most similar to one of targets.
+
+    Return None if no part is similar enough. As in difflib, ties go to
+    the greater part.
+    """
+    score, part = max(
+        (similarity(target, part), part)
+        for target in targets for part in parts)
+    return part if score >= SIMILARITY_CUTOFF else None
+
+
+def find_meta_date(meta: MetaIndex):
+    """Return the ANYDATE match of the first meta tag that has a date."""
+    entries = sorted(
+        e for name, name_entries in meta.items()
+        if DATE_META_NAME_FULLMATCH(name) for e in name_entries)
+    for _, content in entries:
+        m = DATE_CONTENT_SEARCH(content)
+        if m:
+            return m
+    return None
+
+
+def find_date(
+    meta: MetaIndex, page: Page, url: str,
+    date_published: Optional[datetime_date] = None,
+) -> datetime_date:
+    """Return the date of the document.
+
+    date_published, e.g. from JSON-LD data, is used if there is no date meta
+    tag. The other methods need to decode and scan the whole page.
+    """
     # Example for find_any_date(url):
     # http://ftalphaville.ft.com/2012/05/16/1002861/recap-and-tranche-primer/?Authorised=false
-    # Example for find_any_date(html):
+    # Example for scan_date(page):
     # https://www.bbc.com/news/uk-england-25462900
-    m = DATE_SEARCH(html)
-    return find_any_date(m) if m else find_any_date(url) or find_any_date(html)
+    m = find_meta_date(meta)
+    if m is None:
+        if date_published:
+            return date_published
+        m = DATE_TEXT_SEARCH(page.html)
+    if m:
+        return find_any_date(m)
+    return find_any_date(url) or scan_date(page)
+
+
+def scan_date(page: Page) -> Optional[datetime_date]:
+    """Return the first date found in the likely regions of the page.
+
+    The regions are tried in order: the datetime attributes of time tags,
+    the text after the first h1 or byline, and the beginning of the body.
+    """
+    for m in TIME_DATETIME_FINDITER(page.content):
+        date = find_any_date(m['result'].decode('latin-1'))
+        if date:
+            return date
+    html = page.html
+    m = BODY_START_SEARCH(html)
+    body_start = m.end() if m else 0
+    m = DATE_ANCHOR_SEARCH(html, body_start)
+    if m:
+        date = find_any_date(ANYDATE_SEARCH(
+            html, m.start(), m.start() + ANCHOR_DATE_WINDOW))
+        if date:
+            return date
+    return find_any_date(ANYDATE_SEARCH(
+        html, body_start, body_start + BODY_DATE_WINDOW))
+
+
+class HomeTitle:
 
+    """An awaitable of the title of the home page of url.
 
-def get_home_title(url: str, home_title_list: List[str]) -> None:
+    get_home_title is run in the executor when the object is first awaited,
+    when start is called, or after HOME_TITLE_HEAD_START seconds. cancel
+    stops the fetch, also if it is already running in a thread, and closes
+    its response; it is started again if the object is awaited after that.
+    """
+
+    __slots__ = 'url', 'future', 'timer', 'cancelled'
+
+    def __init__(self, url: str):
+        self.url = url
+        self.future = None
+        self.cancelled = None
+        self.timer = None if HOME_TITLE_HEAD_START is None else \
+            get_running_loop().call_later(HOME_TITLE_HEAD_START, self.start)
+
+    def start(self) -> Future:
+        if self.future is None or self.future.cancelled():
+            self.cancelled = Event()
+            self.future = in_executor(get_home_title, self.url, self.cancelled)
+        return self.future
+
+    def __await__(self):
+        return self.start().__await__()
+
+    def cancel(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.future is not None:
+            self.cancelled.set()
+            self.future.cancel()
+
+
+def get_home_title(
+    url: str, cancelled: Optional[Event] = None
+) -> Optional[str]:
     """Get homepage of the url and return it's title.
 
-    home_title_list will be used to return the thread result.
-    This function is invoked through a thread.
+    Return None if the home page could not be fetched or decoded, or if
+    cancelled was set. Results are cached per scheme and netloc, failures
+    for a shorter time. Failures that may be caused by the user request
+    itself, i.e. timeouts, rate limits and the lack of time, are not
+    cached. Concurrent fetches of the same home page are coalesced; if the
+    shared fetch is cancelled by another caller, it is retried. This
+    function is invoked through lib.commons.in_executor.
     """
-    # Todo: cache the result.
     home_url = '://'.join(urlparse(url)[:2])
-    with request(
-        home_url, spoof=True, stream=True
-    ) as r:
+    home_title = HOME_TITLE_CACHE.get(home_url)
+    while home_title is MISSING:
         try:
-            check_response_headers(r)
-        except (
-            RequestException, StatusCodeError,
-            ContentTypeError, ContentLengthError,
-        ):
-            return
-        content = next(r.iter_content(MAX_RESPONSE_LENGTH))
-    m = CHARSET(content)
-    html = content.decode(m[1].decode() if m else r.encoding)
-    m = TITLE_TAG(html)
-    title = html_unescape(m['result']) if m else None
-    home_title_list.append(title)
+            home_title = coalesce(
+                ('home_title', home_url), fetch_home_title, home_url,
+                cancelled)
+        except FetchCancelled:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            continue
+        except (Timeout, RateLimitError):
+            return None
+        if home_title is None and (is_degraded() or out_of_time()):
+            return None
+        HOME_TITLE_CACHE.set(
+            home_url, home_title,
+            HOME_TITLE_TTL if home_title is not None
+            else HOME_TITLE_FAILURE_TTL)
+    return home_title
+
+
+def out_of_time() -> bool:
+    """Return True if the deadline of the user request has passed."""
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def fetch_home_title(
+    home_url: str, cancelled: Optional[Event] = None
+) -> Optional[str]:
+    """Return the title of home_url or None on failure.
+
+    Raise FetchCancelled if cancelled is set before the head is read.
+    Timeout and RateLimitError are raised, too.
+    """
+    try:
+        page = get_head(home_url, cancelled)
+        return find_html_title(page.content, page.encoding)
+    except (Timeout, RateLimitError):
+        raise
+    except (
+        RequestException, StatusCodeError,
+        ContentTypeError, ContentLengthError,
+        LookupError, ValueError,
+    ):
+        return None
 
 
 def check_response_headers(r: RequestsResponse) -> None:
@@ -537,57 +759,367 @@ def check_response_headers(r: RequestsResponse) -> None:
     return
 
 
-def get_html(url: str) -> str:
-    """Return the html string for the given url."""
+def get_head(url: str, cancelled: Optional[Event] = None) -> Page:
+    """Return the Page of the head of url, i.e. of the bytes up to </head>.
+
+    See read_html for cancelled. The response is closed when it is set.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise FetchCancelled(url)
+    with request(
+        url, spoof=True, stream=True
+    ) as r:
+        check_response_headers(r)
+        content = read_html(
+            r.iter_content(CHUNK_SIZE), head_only=True, cancelled=cancelled)
+    return response_page(r, content)
+
+
+@single_flight
+def get_page(url: str) -> Page:
+    """Return the Page of the given url."""
     with request(
         url, stream=True, spoof=True
     ) as r:
         check_response_headers(r)
-        content = next(r.iter_content(MAX_RESPONSE_LENGTH))
-    charset_match = CHARSET(content)
-    return content.decode(
-        charset_match[1].decode() if charset_match else r.encoding)
+        content = read_html(r.iter_content(CHUNK_SIZE))
+    return response_page(r, content)
 
 
-def url2dict(url: str) -> Dict[str, Any]:
-    """Get url and return the result as a dictionary."""
-    d = defaultdict(lambda: None)
-    # Creating a thread to request homepage title in background
-    home_title_list = []  # A mutable variable used to get the thread result
-    home_title_thread = Thread(
-        target=get_home_title, args=(url, home_title_list))
-    home_title_thread.start()
-
-    html = get_html(url)
-    d['url'] = find_url(html, url)
+class StreamedPage:
+
+    """A page that is downloaded once, its head first and the rest on demand.
+
+    read_head returns the Page of the head, like get_head. read_page returns
+    the Page of the whole page, like get_page, continuing the same response
+    from where read_head stopped. The response is closed by read_page or,
+    if it is not needed, by close.
+    """
+
+    __slots__ = 'url', 'response', 'chunks', 'head'
+
+    def __init__(self, url: str):
+        self.url = url
+        self.response = self.chunks = self.head = None
+
+    def read_head(self) -> Page:
+        r = self.response = request(self.url, spoof=True, stream=True)
+        try:
+            check_response_headers(r)
+            self.chunks = r.iter_content(CHUNK_SIZE)
+            self.head = read_html(self.chunks, head_only=True)
+        except BaseException:
+            r.close()
+            raise
+        return response_page(r, self.head)
+
+    def read_page(self) -> Page:
+        with self.response as r:
+            content = read_html(chain((self.head,), self.chunks))
+        return response_page(r, content)
+
+    def close(self) -> None:
+        if self.response is not None:
+            self.response.close()
+
+
+def find_html_title(
+    html: Union[str, bytes], encoding: str = 'utf-8'
+) -> Optional[str]:
+    """Return the unescaped text of the title tag."""
+    if isinstance(html, str):
+        html, encoding = html.encode(), 'utf-8'
     m = TITLE_TAG(html)
-    html_title = html_unescape(m['result']) if m else None
-    if html_title:
-        d['html_title'] = html_title
-    # d['html_title'] is used in waybackmechine.py.
-    authors = find_authors(html)
+    if m is None:
+        return None
+    return html_unescape(m['result'].decode(encoding, 'replace'))
+
+
+def head_has_metadata(head: bytes) -> bool:
+    """Return True if title, date, and authors can be found in head."""
+    # The patterns only need the ASCII parts of the markup.
+    meta = MetaIndex(head, encoding='latin-1')
+    jsonld = find_jsonld(head, 'latin-1')
+    return bool(
+        (meta.first(TITLE_META_NAMES) or TITLE_TAG(head))
+        and (find_meta_date(meta) or 'date' in jsonld)
+        and (find_meta_authors(head, 'latin-1') or 'authors' in jsonld
+             or find_byline_authors(head.decode('latin-1'))))
+
+
+def read_html(
+    chunks: Iterator[bytes], head_only: bool = False,
+    cancelled: Optional[Event] = None,
+) -> bytes:
+    """Read the chunks of an html document and return the needed part.
+
+    Stop at most MAX_RESPONSE_LENGTH bytes. If head_only is True, stop at the
+    end of the head. Otherwise, stop BODY_WINDOW bytes after the end of the
+    head if the head has the title, date, and authors of the page.
+    Raise FetchCancelled if the cancelled event is set between two chunks.
+    """
+    content = bytearray()
+    head_end = None
+    for chunk in chunks:
+        if cancelled is not None and cancelled.is_set():
+            raise FetchCancelled
+        # </head> might be split between the chunks.
+        pos = max(len(content) - 10, 0)
+        content += chunk
+        if len(content) >= MAX_RESPONSE_LENGTH:
+            break
+        if head_end is None:
+            m = HEAD_END(content, pos)
+            if m is None:
+                continue
+            if head_only:
+                break
+            callback = HEAD_CALLBACK.get()
+            if callback is not None:
+                callback(bytes(content[:m.end()]))
+            if head_has_metadata(content[:m.end()]):
+                head_end = m.end()
+            else:  # Bylines or dates in the body might be needed.
+                head_end = MAX_RESPONSE_LENGTH
+        if len(content) >= head_end + BODY_WINDOW:
+            break
+    return bytes(content[:MAX_RESPONSE_LENGTH])
+
+
+def decode_html(content: bytes, encoding: Optional[str]) -> str:
+    """Decode content using the given encoding or its meta charset.
+
+    The content may have been cut in the middle of a multi-byte character.
+    """
+    return Page(content, sniff_encoding(content, encoding)).html
+
+
+async def generic_fields(
+    d: Dict[str, Any],
+    meta: MetaIndex,
+    jsonld: Dict[str, Any],
+    page: Page,
+    html_title: Optional[str],
+    url: str,
+    home_title: Awaitable[Optional[str]],
+) -> None:
+    """Set the authors, journal or website, title, and date of d."""
+    # The byline patterns are only tried if there is no structured data.
+    authors = (
+        find_meta_authors(page.content, page.encoding)
+        or jsonld.get('authors') or find_byline_authors(page.html))
     if authors:
         d['authors'] = authors
-    d['issn'] = find_issn(html)
-    d['pmid'] = find_pmid(html)
-    d['doi'] = find_doi(html)
-    d['volume'] = find_volume(html)
-    d['issue'] = find_issue(html)
-    d['page'] = find_pages(html)
-    d['journal'] = find_journal(html)
+    d['journal'] = find_journal(meta) or jsonld.get('journal')
     if d['journal']:
         d['cite_type'] = 'journal'
     else:
         d['cite_type'] = 'web'
-        d['website'] = find_site_name(
-            html, html_title, url, authors, home_title_list, home_title_thread)
-    d['title'] = find_title(
-        html, html_title, url, authors, home_title_list, home_title_thread)
-    date = find_date(html, url)
+        d['website'] = await find_site_name(
+            meta, html_title, url, authors, home_title,
+            jsonld.get('website'))
+    d['title'] = await find_title(
+        meta, page, html_title, url, authors, home_title,
+        jsonld.get('title'), d['website'])
+    # The home page might not have been needed at all.
+    home_title.cancel()
+    date = find_date(meta, page, url, jsonld.get('date'))
+    if date:
+        d['date'] = date
+        d['year'] = str(date.year)
+
+
+async def profile_fields(
+    d: Dict[str, Any],
+    profile: Profile,
+    meta: MetaIndex,
+    jsonld: Dict[str, Any],
+    page: Page,
+    html_title: Optional[str],
+    url: str,
+    home_title: Optional[Awaitable[Optional[str]]],
+) -> None:
+    """Set the authors, website, title, and date of d using profile."""
+    authors = None
+    for name in profile.authors_meta:
+        entries = meta.get(name)
+        if entries:
+            authors = [
+                n for _, content in entries
+                for n in byline_to_names(html_unescape(content)) or ()]
+            break
+    authors = authors or jsonld.get('authors')
+    if not authors and profile.authors_search is not None:
+        m = profile.authors_search(page.html)
+        if m:
+            authors = byline_to_names(html_unescape(m['result']))
+    if authors:
+        d['authors'] = authors
+    d['cite_type'] = 'web'
+    d['website'] = meta.first(profile.website_meta) or profile.website
+    title = (
+        meta.first(profile.title_meta) or jsonld.get('title') or html_title)
+    if title:
+        title = html_unescape(title)
+        # The name of the site stands in for the title of the home page.
+        d['title'] = (
+            parse_title(title, url, authors, d['website'])
+            if home_title is None
+            else await async_parse_title(title, url, authors, home_title)
+        )[1]
+    if home_title is not None:
+        home_title.cancel()
+    date = None
+    for name in profile.date_meta:
+        for _, content in meta.get(name, ()):
+            m = DATE_CONTENT_SEARCH(content)
+            if m:
+                date = find_any_date(m)
+                break
+        if date:
+            break
+    date = date or jsonld.get('date') or find_any_date(url)
     if date:
         d['date'] = date
         d['year'] = str(date.year)
-    d['language'] = classify(html)[0]
+
+
+class CrossrefUpgrade:
+
+    """The Crossref records of the DOIs of a page that is being read.
+
+    The lookup of the citation_doi of the head starts before the rest of the
+    page is downloaded and parsed. Use the on_head method as HEAD_CALLBACK.
+    """
+
+    __slots__ = 'loop', 'tasks'
+
+    def __init__(self):
+        self.loop = get_running_loop()
+        self.tasks = {}
+
+    def start(self, doi: str) -> None:
+        if doi not in self.tasks:
+            self.tasks[doi] = ensure_future(doi_dict(doi))
+
+    def on_head(self, head: bytes) -> None:
+        """Start the lookup of the DOI of head. Thread-safe."""
+        doi = find_doi(MetaIndex(head, encoding='latin-1'))
+        if doi:
+            try:
+                self.loop.call_soon_threadsafe(self.start, doi)
+            except RuntimeError:  # url2dict has been cancelled
+                pass
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+
+    async def merge(self, d: Dict[str, Any], doi: str) -> None:
+        """Update d with the Crossref record of doi.
+
+        Wait for at most CROSSREF_BUDGET seconds and leave d unchanged if the
+        record is not ready by then or could not be fetched.
+        """
+        self.start(doi)
+        task = self.tasks.pop(doi)
+        self.cancel()  # the DOI of the head may have been different
+        budget = CROSSREF_BUDGET
+        remaining = remaining_time()
+        if remaining is not None:
+            budget = max(min(budget, remaining), 0)
+        try:
+            crossref = await wait_for(task, budget)
+        except AsyncioTimeoutError:
+            deadline = DEADLINE.get()
+            if deadline is not None:
+                deadline.degraded = True
+            return
+        except Exception:  # the page is cited without the record
+            logger.warning('crossref lookup failed for %s', doi, exc_info=True)
+            return
+        for field in CROSSREF_FIELDS:
+            value = crossref[field]
+            if value:
+                d[field] = value
+        date = crossref['date']
+        if date:
+            d['date'] = date
+            d['year'] = str(date.year)
+        elif crossref['year']:
+            # The date of the page is usually the online publication date.
+            d['date'] = None
+            d['year'] = crossref['year']
+
+
+@cached_dict(6 * HOUR)
+async def url2dict(url: str) -> Dict[str, Any]:
+    """Get url and return the result as a dictionary."""
+    return await page_dict(url)
+
+
+async def page_dict(
+    url: str, fetch_url: Optional[str] = None,
+    home_title: Optional[HomeTitle] = None,
+    streamed: Optional[StreamedPage] = None,
+) -> Dict[str, Any]:
+    """Return the dictionary of the page of url.
+
+    The page is downloaded from fetch_url, e.g. an archived copy of url, if
+    it is given. home_title can be shared with other pages of the same site,
+    it is HomeTitle(url) by default. If the head of the page has already
+    been read by streamed, the rest of the page is read from it.
+    """
+    fetch_url = fetch_url or url
+    # Each request runs in its own context, so this is never reset.
+    CURRENT_URL.set(fetch_url)
+    d = defaultdict(lambda: None)
+    profile = find_profile(urlparse(url).hostname)
+    crossref = CrossrefUpgrade() if CROSSREF_UPGRADE else None
+    if profile is not None and not profile.home_title:
+        home_title = None
+    elif home_title is None:
+        home_title = HomeTitle(url)
+    try:
+        if crossref is not None:
+            token = HEAD_CALLBACK.set(crossref.on_head)
+        try:
+            if streamed is None:
+                page = await in_executor(get_page, fetch_url)
+            else:
+                page = await in_executor(streamed.read_page)
+        finally:
+            if crossref is not None:
+                HEAD_CALLBACK.reset(token)
+        meta = MetaIndex(page.content, page.encoding, HEAD_SCOPED_META)
+        jsonld = find_jsonld(page.content, page.encoding)
+        d['url'] = find_url(meta, url)
+        html_title = find_html_title(page.content, page.encoding)
+        if html_title:
+            d['html_title'] = html_title
+        # d['html_title'] is used in waybackmechine.py.
+        d['issn'] = find_issn(meta)
+        d['pmid'] = find_pmid(meta)
+        d['doi'] = find_doi(meta)
+        d['volume'] = find_volume(meta)
+        d['issue'] = find_issue(meta)
+        d['page'] = find_pages(meta)
+        if profile is not None:
+            await profile_fields(
+                d, profile, meta, jsonld, page, html_title, url, home_title)
+        else:
+            await generic_fields(
+                d, meta, jsonld, page, html_title, url, home_title)
+        d['language'] = find_language(
+            page, meta, urlparse(url).hostname, d['title'])
+        if crossref is not None and d['doi']:
+            await crossref.merge(d, d['doi'])
+    finally:
+        # The tasks are not needed anymore, also if anything above failed.
+        if home_title is not None:
+            home_title.cancel()
+        if crossref is not None:
+            crossref.cancel()
     return d
 
 
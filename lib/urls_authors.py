@@ -7,11 +7,12 @@ It is in urls.py.
 """
 
 
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
-from regex import compile as regex_compile, VERBOSE, IGNORECASE, ASCII
+from regex import VERBOSE, IGNORECASE, ASCII, DOTALL
 
 from lib.commons import ANYDATE_SEARCH, first_last, InvalidNameError
+from lib.regex_timeout import timed_compile
 
 
 # Names in byline are required to be two or three parts
@@ -50,11 +51,11 @@ BYLINE_PATTERN = r'''
         )?
     )?\s*
 '''.format_map(locals())
-BYLINE_PATTERN_SEARCH = regex_compile(BYLINE_PATTERN, VERBOSE | IGNORECASE)
+BYLINE_PATTERN_SEARCH = timed_compile(BYLINE_PATTERN, VERBOSE | IGNORECASE)
 
-NORMALIZE_ANDS = regex_compile(r'\s++and\s++', IGNORECASE).sub
-NORMALIZE_COMMA_SPACES = regex_compile(r'\s*+,\s++', IGNORECASE).sub
-BY_PREFIX = regex_compile(
+NORMALIZE_ANDS = timed_compile(r'\s++and\s++', IGNORECASE).sub
+NORMALIZE_COMMA_SPACES = timed_compile(r'\s*+,\s++', IGNORECASE).sub
+BY_PREFIX = timed_compile(
     r'''
     ^(?:
         (?>
@@ -70,9 +71,9 @@ BY_PREFIX = regex_compile(
     ''',
     IGNORECASE | VERBOSE,
 ).sub
-AND_OR_COMMA_SUFFIX = regex_compile(r'(?> and|,)?\s*+$', IGNORECASE).sub
-AND_OR_COMMA_SPLIT = regex_compile(r', and | and |, |;', IGNORECASE).split
-AND_SPLIT = regex_compile(r', and | and |;', IGNORECASE).split
+AND_OR_COMMA_SUFFIX = timed_compile(r'(?> and|,)?\s*+$', IGNORECASE).sub
+AND_OR_COMMA_SPLIT = timed_compile(r', and | and |, |;', IGNORECASE).split
+AND_SPLIT = timed_compile(r', and | and |;', IGNORECASE).split
 
 CONTENT_ATTR = r'''
     content=(?<q>["\'])
@@ -95,21 +96,22 @@ AUTHOR_META_NAME_OR_PROP = r'''
         )
     (?P=q))
 '''
-META_AUTHOR_FINDITER = regex_compile(
+# It runs on the bytes of the page, see lib.urls.Page.
+META_AUTHOR_FINDITER = timed_compile(
     r'''
     <meta\s[^>]*?(?:
         {AUTHOR_META_NAME_OR_PROP}\s[^c]*+[^>]*?{CONTENT_ATTR}
         |
         {CONTENT_ATTR}\s[^>]*?{AUTHOR_META_NAME_OR_PROP}
     )
-    '''.format_map(locals()),
+    '''.format_map(locals()).encode(),
     VERBOSE | IGNORECASE
 ).finditer
 # id=byline
 # http://www.washingtonpost.com/wp-dyn/content/article/2006/12/20/AR2006122002165.html
 # rel=author
 # http://timesofindia.indiatimes.com/india/27-ft-whale-found-dead-on-Orissa-shore/articleshow/1339609.cms?referral=PM
-BYLINE_TAG_FINDITER = regex_compile(
+BYLINE_TAG_FINDITER = timed_compile(
     r'''
     (?>
         # author_byline example:
@@ -146,26 +148,44 @@ BYLINE_TAG_FINDITER = regex_compile(
 ).finditer
 
 
-BYLINE_HTML_PATTERN = regex_compile(
+BYLINE_HTML_PATTERN = timed_compile(
     '>' + BYLINE_PATTERN + '<', VERBOSE | IGNORECASE
 ).search
 # [\n|]{BYLINE_PATTERN}\n
 # http://voices.washingtonpost.com/thefix/eye-on-2008/2008-whale-update.html
-BYLINE_TEXT_PATTERN = regex_compile(
+BYLINE_TEXT_PATTERN = timed_compile(
     r'[\n|]' + BYLINE_PATTERN + r'\n', VERBOSE | IGNORECASE
 ).search
 
-TAGS_SUB = regex_compile(r'</?[a-z][^>]*+>', IGNORECASE).sub
+TAGS_SUB = timed_compile(r'</?[a-z][^>]*+>', IGNORECASE).sub
+
+# A run of visible text followed by the tags, scripts, styles and comments
+# after it. Matching both in one go keeps the number of matches low.
+VISIBLE_TEXT_FINDITER = timed_compile(
+    r'''
+    (?<text>(?>[^<]++|<(?!/?[a-z]|!--))*+)
+    (?>
+        <(?<skipped>script|style)\b.*?</(?P=skipped)\s*+>
+        |<!--.*?-->
+        |</?[a-z][^>]*+>
+    )*+
+    ''', VERBOSE | IGNORECASE | DOTALL).finditer
+
+# BYLINE_TEXT_PATTERN is searched in chunks of at least this many characters
+# of visible text. The last BYLINE_OVERLAP characters of each chunk are
+# searched again with the next one, so that bylines across chunks are found.
+TEXT_CHUNK = 16384
+BYLINE_OVERLAP = 1000
 
 # http://www.businessnewsdaily.com/6762-male-female-entrepreneurs.html?cmpid=514642_20140715_27858876
 #  .byline > .author
-BYLINE_AUTHOR = regex_compile(
+BYLINE_AUTHOR = timed_compile(
     r'<[a-z]++[^c]*+[^>]*?class=(?<q>["\'])author(?P=q)'
     r'[^>]*+>(?<result>[^<>]++)',
     IGNORECASE | ASCII
 ).finditer
 
-STOPWORDS_SEARCH = regex_compile(
+STOPWORDS_SEARCH = timed_compile(
     r'''
     \b(?>
         Administrator
@@ -186,22 +206,38 @@ STOPWORDS_SEARCH = regex_compile(
     IGNORECASE | VERBOSE,
 ).search
 
-FOUR_DIGIT_NUM = regex_compile(r'\d\d\d\d').search
+FOUR_DIGIT_NUM = timed_compile(r'\d\d\d\d').search
 
 
 def find_authors(html) -> Optional[List[Tuple[str, str]]]:
     """Return authors names found in html."""
+    return find_meta_authors(html) or find_byline_authors(html)
+
+
+def find_meta_authors(
+    html, encoding: str = 'utf-8'
+) -> Optional[List[Tuple[str, str]]]:
+    """Return authors names found in the author meta tags of html.
+
+    html may be the content of a lib.urls.Page and encoding its encoding.
+    """
+    if isinstance(html, str):
+        html, encoding = html.encode(), 'utf-8'
     names = []
     match_id = None
     for match in META_AUTHOR_FINDITER(html):
         if match_id and match_id != match['id']:
             break
-        name = byline_to_names(match['result'])
+        name = byline_to_names(match['result'].decode(encoding))
         if name:
             names.extend(name)
             match_id = match['id']
-    if names:
-        return names
+    return names or None
+
+
+def find_byline_authors(html) -> Optional[List[Tuple[str, str]]]:
+    """Return authors names found in the bylines of html."""
+    names = []
     match_id = None
     for match in BYLINE_TAG_FINDITER(html):
         # Only match authors using the same search criteria.
@@ -229,7 +265,36 @@ def find_authors(html) -> Optional[List[Tuple[str, str]]]:
                 names.extend(ns)
     if names:
         return names
-    match = BYLINE_TEXT_PATTERN(TAGS_SUB('', html))
+    return find_text_byline(html)
+
+
+def visible_text(html: str) -> Iterator[str]:
+    """Yield the visible text of html, segment by segment."""
+    for m in VISIBLE_TEXT_FINDITER(html):
+        text = m['text']
+        if text:
+            yield text
+
+
+def find_text_byline(html: str) -> Optional[List[Tuple[str, str]]]:
+    """Return the names of the first byline in the visible text of html.
+
+    The text is consumed lazily and the search stops at the first match.
+    """
+    chunk = []
+    length = 0
+    for text in visible_text(html):
+        chunk.append(text)
+        length += len(text)
+        if length < TEXT_CHUNK:
+            continue
+        text = ''.join(chunk)
+        match = BYLINE_TEXT_PATTERN(text)
+        if match:
+            return byline_to_names(match[0])
+        chunk = [text[-BYLINE_OVERLAP:]]
+        length = len(chunk[0])
+    match = BYLINE_TEXT_PATTERN(''.join(chunk))
     if match:
         return byline_to_names(match[0])
     return None
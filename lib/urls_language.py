@@ -0,0 +1,109 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Find the language of a web page.
+
+It is used in urls.py.
+"""
+
+
+from codecs import getincrementaldecoder
+from html import unescape as html_unescape
+from typing import Optional
+
+from langid import classify
+from regex import VERBOSE, IGNORECASE, DOTALL
+
+from lib.cache import LRUCache, DAY
+from lib.regex_timeout import timed_compile
+
+
+# HTML_LANG_SEARCH and BODY_START_SEARCH run on the bytes of the page.
+HTML_LANG_SEARCH = timed_compile(
+    rb'''
+    <html\b[^>]*?\blang\s*+=\s*+["']?(?<lang>[^\s"'>]++)
+    ''',
+    VERBOSE | IGNORECASE,
+).search
+# The primary subtag of a language tag or locale, e.g. en in en-US or en_US.
+LANG_CODE_MATCH = timed_compile(r'\s*+([a-z]{2,3})(?![a-z])', IGNORECASE).match
+LANGUAGE_META_NAMES = 'og:locale', 'content-language'
+DESCRIPTION_META_NAMES = 'description', 'og:description'
+
+BODY_START_SEARCH = timed_compile(rb'<body\b[^>]*+>', IGNORECASE).search
+INVISIBLE_TEXT_SUB = timed_compile(
+    r'''
+    <(script|style|noscript|template)\b.*?</\1\s*+>
+    |<!--.*?-->
+    |<[^>]*+>
+    ''',
+    VERBOSE | IGNORECASE | DOTALL,
+).sub
+SPACES_SUB = timed_compile(r'\s++').sub
+
+# Number of bytes after <body> that are decoded and stripped of markup.
+TEXT_WINDOW = 50000
+# Maximum number of characters that are passed to langid.
+SAMPLE_LENGTH = 1000
+
+# Detected languages are reused for other pages of the same hostname.
+DETECTED_LANGUAGE_TTL = DAY
+DETECTED_LANGUAGES = LRUCache()
+
+
+def language_code(value: Optional[str]) -> Optional[str]:
+    """Return the primary language subtag of value in lower case."""
+    if not value:
+        return None
+    m = LANG_CODE_MATCH(value)
+    if m is None:
+        return None
+    code = m[1].lower()
+    return None if code in ('und', 'mul', 'zxx') else code
+
+
+def find_declared_language(content: bytes, meta) -> Optional[str]:
+    """Return the language declared in <html lang> or the meta tags."""
+    m = HTML_LANG_SEARCH(content)
+    return (
+        (language_code(m['lang'].decode('latin-1')) if m else None)
+        or language_code(meta.first(LANGUAGE_META_NAMES)))
+
+
+def text_sample(
+    content: bytes, encoding: str, meta, title: Optional[str]
+) -> str:
+    """Return the title, description and beginning of the visible text.
+
+    Only TEXT_WINDOW bytes of content are decoded.
+    """
+    m = BODY_START_SEARCH(content)
+    start = m.end() if m else 0
+    # The window may end in the middle of a character.
+    window = getincrementaldecoder(encoding)('replace').decode(
+        content[start:start + TEXT_WINDOW])
+    text = SPACES_SUB(' ', INVISIBLE_TEXT_SUB(' ', window))
+    return ' '.join(filter(None, (
+        title, html_unescape(meta.first(DESCRIPTION_META_NAMES) or ''),
+        html_unescape(text).strip(),
+    )))[:SAMPLE_LENGTH]
+
+
+def find_language(
+    page, meta, hostname: str, title: Optional[str] = None
+) -> str:
+    """Return the language of the page.
+
+    page is a lib.urls.Page and meta its MetaIndex. If the page does not
+    declare its language, langid is run on a bounded sample of its text and
+    the result is cached for the hostname.
+    """
+    language = find_declared_language(page.content, meta)
+    if language:
+        return language
+    language = DETECTED_LANGUAGES.get(hostname, None)
+    if language is None:
+        language = classify(
+            text_sample(page.content, page.encoding, meta, title))[0]
+        DETECTED_LANGUAGES.set(hostname, language, DETECTED_LANGUAGE_TTL)
+    return language
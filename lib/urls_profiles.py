@@ -0,0 +1,90 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Extraction profiles of frequently cited web sites.
+
+A profile declares where the fields of the citation are found on the pages
+of a site. Pages of a profiled site skip the generic heuristics of urls.py,
+e.g. the byline and date scans of the whole html and, unless the profile
+needs it, the request for the title of the home page.
+
+It is used in urls.py.
+"""
+
+
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from regex import VERBOSE, IGNORECASE
+
+from lib.regex_timeout import timed_compile
+
+
+class Profile(NamedTuple):
+
+    """The sources of the citation fields of a site.
+
+    website: The name of the site. It is used if none of the website_meta
+        tags is present.
+    website_meta: Names of the meta tags that contain the name of the site.
+    title_meta: Names of the meta tags that contain the title. The title
+        tag of the page is used if none of them is present.
+    authors_meta: Names of the meta tags that contain the author names or
+        bylines. All tags of the first name that is found are used.
+    authors_search: A search function whose 'result' group is a byline.
+        It is used if the meta tags and the JSON-LD data have no authors.
+    date_meta: Names of the meta tags that contain the publication date.
+        JSON-LD data and the url are tried next.
+    home_title: Whether the title of the home page is needed to remove the
+        name of the site from the title of the page.
+    """
+
+    website: str
+    website_meta: Tuple[str, ...] = ()
+    title_meta: Tuple[str, ...] = ('og:title',)
+    authors_meta: Tuple[str, ...] = ()
+    authors_search: Optional[Callable] = None
+    date_meta: Tuple[str, ...] = ('article:published_time',)
+    home_title: bool = False
+
+
+BBC_BYLINE_SEARCH = timed_compile(
+    r'''
+    <[a-z]++\s[^>]*?
+    (?>class="byline__name"|data-testid="byline-name")
+    [^>]*+>(?>\s*+<[^>]++>)*+
+    (?<result>[^<]++)
+    ''',
+    VERBOSE | IGNORECASE,
+).search
+
+BBC = Profile(
+    website='BBC',
+    website_meta=('og:site_name',),
+    authors_search=BBC_BYLINE_SEARCH,
+    date_meta=(),
+)
+
+# Keys are hostnames without the www. prefix. Other subdomains, e.g.
+# news.bbc.co.uk or dealbook.nytimes.com, have different layouts or names
+# and use the generic methods.
+PROFILES = {
+    'nytimes.com': Profile(
+        website='The New York Times',
+        authors_meta=('byl', 'author'),
+    ),
+    'theguardian.com': Profile(
+        website='the Guardian',
+        authors_meta=('author',),
+    ),
+    'bbc.com': BBC,
+    'bbc.co.uk': BBC,
+}
+
+
+def find_profile(hostname: Optional[str]) -> Optional[Profile]:
+    """Return the profile of hostname or None if there is none."""
+    if not hostname:
+        return None
+    if hostname.startswith('www.'):
+        hostname = hostname[4:]
+    return PROFILES.get(hostname)
@@ -4,125 +4,173 @@
 """Define related tools for web.archive.org (aka Wayback Machine)."""
 
 import logging
-from threading import Thread
+from asyncio import ensure_future
+from collections import defaultdict
 from datetime import date
+from typing import Optional
 from urllib.parse import urlparse
 
 from regex import compile as regex_compile
 from requests import ConnectionError as RequestsConnectionError
 
-from lib.commons import dict_to_sfn_cit_ref
+from lib.cache import cached_dict, DAY, MISSING
+from lib.commons import dict_to_sfn_cit_ref, in_executor, run_sync
+from lib.deadline import optional
 from lib.urls import (
-    urls_sfn_cit_ref, url2dict, get_home_title, get_html, find_authors,
-    find_journal, find_site_name, find_title, ContentTypeError,
-    ContentLengthError, StatusCodeError, TITLE_TAG
+    async_urls_sfn_cit_ref, page_dict, HomeTitle, StreamedPage,
+    find_html_title, ContentTypeError, ContentLengthError, StatusCodeError,
+    Page,
 )
 
 
 URL_FULLMATCH = regex_compile(
     r'https?+://web(?:-beta)?+\.archive\.org/(?:web/)?+'
-    r'(\d{4})(\d{2})(\d{2})\d{6}(?>cs_|i(?>d_|m_)|js_)?+/(http.*)'
+    r'((\d{4})(\d{2})(\d{2})\d{6})(?>cs_|i(?>d_|m_)|js_)?+/(http.*)'
 ).fullmatch
+# The snapshot as it was archived, without the banner and rewritten links.
+RAW_URL = 'https://web.archive.org/web/{}id_/{}'
+# If the snapshot has all these fields and the html title of the original
+# is the same, the original page is not processed.
+COMPLETE_FIELDS = 'title', 'authors', 'date'
+# The fields of a live original that replace those of the snapshot.
+ORIGINAL_FIELDS = (
+    'html_title', 'authors', 'journal', 'cite_type', 'website', 'title')
+ORIGINAL_ERRORS = (
+    ContentTypeError,
+    ContentLengthError,
+    StatusCodeError,
+    RequestsConnectionError,
+)
 
 
 def waybackmachine_sfn_cit_ref(
     archive_url: str, date_format: str = '%Y-%m-%d'
+) -> tuple:
+    """Create the response namedtuple."""
+    return run_sync(async_waybackmachine_sfn_cit_ref(archive_url, date_format))
+
+
+async def async_waybackmachine_sfn_cit_ref(
+    archive_url: str, date_format: str = '%Y-%m-%d'
 ) -> tuple:
     """Create the response namedtuple."""
     m = URL_FULLMATCH(archive_url)
     if not m:
         # Could not parse the archive_url. Treat as an ordinary URL.
-        return urls_sfn_cit_ref(archive_url, date_format)
-    archive_year, archive_month, archive_day, original_url = \
-        m.groups()
-    original_dict = {}
-    thread = Thread(
-        target=original_url2dict, args=(original_url, original_dict)
-    )
-    thread.start()
+        return await async_urls_sfn_cit_ref(archive_url, date_format)
     try:
-        archive_dict = url2dict(archive_url)
+        archive_dict = await waybackmachine_dict(archive_url)
     except (ContentTypeError, ContentLengthError) as e:
         logger.exception(archive_url)
         # Todo: i18n
         return 'Invalid content type or length.', e, ''
     archive_dict['date_format'] = date_format
-    archive_dict['url'] = original_url
-    archive_dict['archive-url'] = archive_url
-    archive_dict['archive-date'] = date(
-        int(archive_year), int(archive_month), int(archive_day)
-    )
-    thread.join()
-    if original_dict:
-        # The original_process has been successful
-        if (
-            original_dict['title'] == archive_dict['title']
-            or original_dict['html_title'] == archive_dict['html_title']
-        ):
-            archive_dict.update(original_dict)
+    return dict_to_sfn_cit_ref(archive_dict)
+
+
+@cached_dict(DAY)
+async def waybackmachine_dict(archive_url: str) -> defaultdict:
+    """Return the dictionary of archive_url which matches URL_FULLMATCH.
+
+    The raw snapshot (the id_ variant of archive_url) and the head of the
+    original url are fetched concurrently. If the head has the html title of
+    the snapshot and the snapshot has all of COMPLETE_FIELDS, the original is
+    live and the rest of its page is not read. Otherwise the whole original
+    page is
+    processed; it is live if its html title or its title is the same as
+    that of the snapshot, and then its ORIGINAL_FIELDS take precedence.
+    The original is downloaded once: the rest of the page continues the
+    response of the head. Both pages share the home title of the original
+    site.
+    """
+    timestamp, archive_year, archive_month, archive_day, original_url = \
+        URL_FULLMATCH(archive_url).groups()
+    home_title = HomeTitle(original_url)
+    original = StreamedPage(original_url)
+    original_task = ensure_future(original_head(original))
+    try:
+        archive_dict = await page_dict(
+            original_url, RAW_URL.format(timestamp, original_url), home_title)
+    except BaseException:
+        original_task.cancel()
+        original.close()
+        home_title.cancel()
+        raise
+    head = await optional(original_task, MISSING)
+    if head is MISSING:
+        # The deadline has passed. The status of the original is unknown.
+        original_task.cancel()
+        original.close()
+    elif head is None:
+        archive_dict['url-status'] = 'dead'
+    else:
+        same_html_title = find_html_title(
+            head.content, head.encoding) == archive_dict['html_title']
+        if same_html_title and all(archive_dict[f] for f in COMPLETE_FIELDS):
+            original.close()
             archive_dict['url-status'] = 'live'
         else:
-            # and original title is the same as archive title. Otherwise it
-            # means that the content probably has changed and the original data
-            # cannot be trusted.
-            archive_dict['url-status'] = 'unfit'
-    else:
-        archive_dict['url-status'] = 'dead'
+            original_dict = await optional(
+                original_page_dict(original_url, home_title, original), {})
+            if same_html_title or (
+                original_dict
+                and original_dict['title'] == archive_dict['title']
+            ):
+                archive_dict['url-status'] = 'live'
+                for key in ORIGINAL_FIELDS:
+                    value = original_dict.get(key)
+                    if value:
+                        archive_dict[key] = value
+            else:
+                # The content has probably changed and the original data
+                # cannot be trusted.
+                archive_dict['url-status'] = 'unfit'
+    home_title.cancel()
     if archive_dict['website'] == 'Wayback Machine':
         archive_dict['website'] = (
             urlparse(original_url).hostname.replace('www.', '')
         )
-    return dict_to_sfn_cit_ref(archive_dict)
+    archive_dict['url'] = original_url
+    archive_dict['archive-url'] = archive_url
+    archive_dict['archive-date'] = date(
+        int(archive_year), int(archive_month), int(archive_day)
+    )
+    return archive_dict
 
 
-def original_url2dict(ogurl: str, original_dict) -> None:
-    """Fill the dictionary with the information found in ogurl."""
+async def original_head(original: StreamedPage) -> Optional[Page]:
+    """Return the Page of the head of original or None on failure."""
     # noinspection PyBroadException
     try:
-        original_dict.update(original_url_dict(ogurl))
-    except (
-        ContentTypeError,
-        ContentLengthError,
-        StatusCodeError,
-        RequestsConnectionError,
-    ):
+        return await in_executor(original.read_head)
+    except ORIGINAL_ERRORS:
         pass
     except Exception:
         logger.exception(
-            'There was an unexpected error in waybackmechine thread'
+            'There was an unexpected error in processing original url: %s',
+            original.url,
         )
+    return None
 
 
-def original_url_dict(url: str):
-    """Retuan dictionary only containing required data for og:url."""
-    d = {}
-    # Creating a thread to request homepage title in background
-    hometitle_list = []  # A mutable variable used to get the thread result
-    home_title_thread = Thread(
-        target=get_home_title, args=(url, hometitle_list)
-    )
-    home_title_thread.start()
-    html = get_html(url)
-    m = TITLE_TAG(html)
-    html_title = m['result'] if m else None
-    if html_title:
-        d['html_title'] = html_title
-    authors = find_authors(html)
-    if authors:
-        d['authors'] = authors
-    journal = find_journal(html)
-    if journal:
-        d['journal'] = journal
-        d['cite_type'] = 'journal'
-    else:
-        d['cite_type'] = 'web'
-        d['website'] = find_site_name(
-            html, html_title, url, authors, hometitle_list, home_title_thread
+async def original_page_dict(
+    url: str, home_title: HomeTitle, original: StreamedPage
+) -> dict:
+    """Return the dictionary of url or an empty dict on failure.
+
+    The head of the page must have been read by original.
+    """
+    # noinspection PyBroadException
+    try:
+        return await page_dict(url, home_title=home_title, streamed=original)
+    except ORIGINAL_ERRORS:
+        pass
+    except Exception:
+        logger.exception(
+            'There was an unexpected error in processing original url: %s',
+            url,
         )
-    d['title'] = find_title(
-        html, html_title, url, authors, hometitle_list, home_title_thread
-    )
-    return d
+    return {}
 
 
 logger = logging.getLogger(__name__)
@@ -7,9 +7,16 @@ from os.path import abspath
 
 from requests import Session
 
+import config
+
 # Do not import library parts here. commons.py should not be loaded
 # until LANG is set by test_fa and test_en.
 
+# Responses are cached in .tests_cache, do not use lib.http_cache.
+config.HTTP_CACHE_MAX_SIZE = 0
+# Do not persist computed results between test runs.
+config.CACHE_PATH = ''
+
 
 FORCE_CACHE_OVERWRITE = False  # Use for updating cache entries
 CHACHE_CHANGE = False
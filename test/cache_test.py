@@ -0,0 +1,136 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test cache.py module."""
+
+
+from asyncio import run
+from collections import defaultdict
+from tempfile import TemporaryDirectory
+from threading import Lock, local
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from lib import cache
+from lib.cache import LRUCache, TwoTierCache, MISSING, cached_dict
+from lib.deadline import DEADLINE, Deadline
+
+
+class LRUCacheTest(TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        c = LRUCache(2)
+        c.set('a', 1, 60)
+        c.set('b', 2, 60)
+        c.get('a')
+        c.set('c', 3, 60)
+        self.assertEqual(c.get('a'), 1)
+        self.assertIs(c.get('b'), MISSING)
+        self.assertEqual(c.get('c'), 3)
+
+    def test_expiration(self):
+        c = LRUCache(2)
+        c.set('a', 1, -1)
+        self.assertIsNone(c.get('a', None))
+
+    def test_none_is_a_value(self):
+        c = LRUCache(2)
+        c.set('a', None, 60)
+        self.assertIsNone(c.get('a'))
+
+
+class TwoTierCacheTest(TestCase):
+
+    def setUp(self):
+        tempdir = TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        for patcher in (
+            patch.object(cache, 'DB_PATH', tempdir.name + '/c.db'),
+            patch.object(cache, 'connections', local()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sqlite_tier_is_shared(self):
+        key = ('doi', '10.1/x', 'en')
+        TwoTierCache('t').set(key, {'title': 'T'}, 60)
+        # A new instance has an empty LRU tier, like another worker would.
+        other = TwoTierCache('t')
+        self.assertEqual(other.get(key), {'title': 'T'})
+        self.assertEqual(other.lru.get(key), {'title': 'T'})
+
+    def test_expired_entries_are_missing(self):
+        TwoTierCache('t').set('k', 1, -1)
+        self.assertIs(TwoTierCache('t').get('k'), MISSING)
+
+    def test_unpicklable_value_is_not_stored(self):
+        def local_function():
+            pass
+
+        c = TwoTierCache('t')
+        for value in (lambda: None, local_function, Lock()):
+            with self.subTest(value=value), \
+                    self.assertLogs(cache.logger, 'ERROR'):
+                c.set('k', value, 60)
+            # The LRU tier still has the value.
+            self.assertIs(c.get('k'), value)
+            self.assertIs(TwoTierCache('t').get('k'), MISSING)
+
+
+class CachedDictTest(TestCase):
+
+    def setUp(self):
+        patcher = patch.object(cache, 'DICT_CACHE', TwoTierCache('dicts', 10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached_dict_is_copied(self):
+        calls = []
+
+        @cached_dict(60)
+        async def resolve(id_):
+            calls.append(id_)
+            d = defaultdict(lambda: None)
+            d['authors'] = [('A', 'B')]
+            return d
+
+        d = run(resolve('1'))
+        d['date_format'] = '%Y'
+        d['authors'].append(('C', 'D'))
+        d = run(resolve('1'))
+        self.assertEqual(calls, ['1'])
+        self.assertIsInstance(d, defaultdict)
+        self.assertIsNone(d['date_format'])
+        self.assertEqual(d['authors'], [('A', 'B')])
+
+    def test_none_is_not_cached(self):
+        calls = []
+
+        @cached_dict(60)
+        async def resolve(id_):
+            calls.append(id_)
+
+        run(resolve('1'))
+        run(resolve('1'))
+        self.assertEqual(calls, ['1', '1'])
+
+    def test_degraded_result_is_not_cached(self):
+        calls = []
+
+        @cached_dict(60)
+        async def resolve(id_):
+            calls.append(id_)
+            DEADLINE.get().degraded = True
+            return {}
+
+        async def resolve_with_deadline():
+            DEADLINE.set(Deadline(5))
+            return await resolve('1')
+
+        run(resolve_with_deadline())
+        run(resolve_with_deadline())
+        self.assertEqual(calls, ['1', '1'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test charset.py module."""
+
+
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from lib import charset
+from lib.cache import LRUCache
+from lib.charset import (
+    sniff_encoding, header_charset, decode_content, decode_stats)
+from lib.urls import Page
+
+
+@patch.object(charset, 'HOST_ENCODINGS', LRUCache(10))
+class SniffEncodingTest(TestCase):
+
+    def test_order(self):
+        meta = b'<meta charset="windows-1256">'
+        self.assertEqual(
+            sniff_encoding(b'\xef\xbb\xbf' + meta, 'latin-1'), 'utf-8')
+        self.assertEqual(sniff_encoding(meta, 'UTF-8'), 'utf-8')
+        self.assertEqual(sniff_encoding(meta, 'unknown'), 'cp1256')
+        self.assertEqual(sniff_encoding(b' ' * 1024 + meta), 'utf-8')
+
+    def test_host_encoding(self):
+        sniff_encoding(b'<meta charset="koi8-r">', None, 'example.com')
+        self.assertEqual(
+            sniff_encoding('é'.encode(), None, 'example.com'), 'koi8-r')
+        self.assertEqual(
+            sniff_encoding('é'.encode(), None, 'example.org'), 'utf-8')
+
+    def test_detection(self):
+        content = (
+            'Привет мир, это тест. '.encode('cp1251') * 100)
+        self.assertEqual(sniff_encoding(content), 'cp1251')
+        # A character may have been cut at the end of the window.
+        with patch.object(charset, 'DETECTION_WINDOW', 3):
+            self.assertEqual(sniff_encoding('aéb'.encode()), 'utf-8')
+
+    def test_stats(self):
+        before = decode_stats()
+        sniff_encoding(b'<meta charset="utf-8">')
+        after = decode_stats()
+        self.assertEqual(after['meta'], before.get('meta', 0) + 1)
+        self.assertGreater(after['sniff_seconds'], 0)
+
+
+@patch.object(charset, 'HOST_ENCODINGS', LRUCache(10))
+class DecodeContentTest(TestCase):
+
+    def test_invalid_byte_after_detection_window(self):
+        content = b'<html>' + b'a' * 20000 + b'caf\xe9'
+        encoding = sniff_encoding(content)
+        self.assertEqual(encoding, 'utf-8')
+        # The last byte may be the start of a character that was cut.
+        self.assertEqual(len(Page(content, encoding).html), 20009)
+        content += b'</html>'
+        self.assertEqual(
+            Page(content, encoding).html[-11:], 'caf\ufffd</html>')
+
+    def test_invalid_byte_is_replaced(self):
+        content = '<html>é'.encode() + b'\xe9 ' + 'ü</html>'.encode()
+        before = decode_stats().get('decode_errors', 0)
+        self.assertEqual(
+            decode_content(content, 'utf-8'), '<html>é\ufffd ü</html>')
+        self.assertEqual(decode_stats()['decode_errors'], before + 1)
+
+    @patch.object(charset, 'DECODE_STATS_LOG_INTERVAL', 1)
+    def test_stats_are_logged(self):
+        with self.assertLogs(charset.logger, 'INFO') as logs:
+            decode_content(b'a', 'utf-8')
+        self.assertIn("'decode': ", logs.output[0])
+
+    def test_cut_character(self):
+        self.assertEqual(decode_content('aé'.encode()[:-1], 'utf-8'), 'a')
+
+
+class HeaderCharsetTest(TestCase):
+
+    def test_header_charset(self):
+        self.assertEqual(
+            header_charset('text/html; charset="UTF-8"'), 'UTF-8')
+        self.assertIsNone(header_charset('text/html'))
+        self.assertIsNone(header_charset(None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test commons.py module."""
+
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Timer
+from time import monotonic
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from lib import commons
+from lib.commons import coalesce, IN_FLIGHT, HostLimiter, RateLimitError, \
+    create_session
+
+
+class CoalesceTest(TestCase):
+
+    def test_concurrent_calls_share_one_call(self):
+        calls = []
+        started = Event()
+        release = Event()
+
+        def fetch(url):
+            calls.append(url)
+            started.set()
+            release.wait(5)
+            return url.upper()
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(coalesce, 'k', fetch, 'a')
+            started.wait(5)
+            # The leader is still running, so this call waits for it.
+            Timer(.1, release.set).start()
+            self.assertEqual(coalesce('k', fetch, 'a'), 'A')
+            self.assertEqual(leader.result(5), 'A')
+        self.assertEqual(calls, ['a'])
+        self.assertNotIn('k', IN_FLIGHT)
+
+    def test_exceptions_are_not_remembered(self):
+        def fail():
+            raise ValueError
+
+        self.assertRaises(ValueError, coalesce, 'k', fail)
+        self.assertEqual(coalesce('k', int, '1'), 1)
+
+
+class HostLimiterTest(TestCase):
+
+    def test_requests_are_paced(self):
+        limiter = HostLimiter(20, 1)
+        start = monotonic()
+        for _ in range(3):
+            with limiter:
+                pass
+        self.assertGreaterEqual(monotonic() - start, .1)
+
+    def test_burst(self):
+        limiter = HostLimiter(1, 3, burst=3)
+        start = monotonic()
+        for _ in range(3):
+            with limiter:
+                pass
+        self.assertLess(monotonic() - start, .5)
+
+    @patch.object(commons, 'MAX_QUEUE_WAIT', .1)
+    def test_long_queues_fail(self):
+        limiter = HostLimiter(1, 2)
+        with limiter:
+            pass
+        tat = limiter.tat
+        self.assertRaises(RateLimitError, limiter.__enter__)
+        # The failed request did not take a token or a slot.
+        self.assertEqual(limiter.tat, tat)
+        self.assertTrue(limiter.semaphore.acquire(False))
+        self.assertTrue(limiter.semaphore.acquire(False))
+
+
+class CreateSessionTest(TestCase):
+
+    @patch.object(commons, 'HTTP_POOL_MAXSIZE', 2)
+    def test_pool_fits_the_executor(self):
+        adapter = create_session().get_adapter('https://example.com/')
+        self.assertEqual(adapter._pool_maxsize, commons.IO_THREADS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test deadline.py module."""
+
+
+from asyncio import run, sleep
+from contextvars import copy_context
+from unittest import main, TestCase
+
+from requests.exceptions import Timeout
+
+from lib.deadline import (
+    DEADLINE, Deadline, optional, request_timeout, is_degraded)
+
+
+def in_context(deadline, func, *args):
+    """Run func in a new context having the given deadline."""
+    def run_func():
+        DEADLINE.set(deadline)
+        return func(*args)
+    return copy_context().run(run_func)
+
+
+class RequestTimeoutTest(TestCase):
+
+    def test_no_deadline(self):
+        self.assertEqual(in_context(None, request_timeout), 10)
+
+    def test_timeout_is_shrunk(self):
+        self.assertLessEqual(in_context(Deadline(3), request_timeout), 3)
+        self.assertEqual(in_context(Deadline(30), request_timeout), 10)
+
+    def test_passed_deadline(self):
+        self.assertRaises(Timeout, in_context, Deadline(-1), request_timeout)
+
+
+class OptionalTest(TestCase):
+
+    def test_slow_step_is_skipped(self):
+        async def main_():
+            result = await optional(sleep(1, 'slow'), 'default')
+            return result, is_degraded()
+
+        self.assertEqual(
+            in_context(Deadline(.05), run, main_()), ('default', True))
+
+    def test_fast_step(self):
+        async def main_():
+            result = await optional(sleep(0, 'fast'), 'default')
+            return result, is_degraded()
+
+        self.assertEqual(
+            in_context(Deadline(5), run, main_()), ('fast', False))
+        self.assertEqual(in_context(None, run, main_()), ('fast', False))
+
+
+if __name__ == '__main__':
+    main()
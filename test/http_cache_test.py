@@ -0,0 +1,172 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test http_cache.py module."""
+
+
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from threading import local
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from lib import http_cache
+
+
+def response(status=200, body=b'', **headers) -> Response:
+    r = Response()
+    r.status_code = status
+    r.url = 'http://example.com/'
+    r.headers = CaseInsensitiveDict(
+        {k.replace('_', '-'): v for k, v in headers.items()})
+    r.raw = BytesIO(body)
+    return r
+
+
+class FakeSend:
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, method, url, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+class HTTPCacheTest(TestCase):
+
+    def setUp(self):
+        tempdir = TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        for patcher in (
+            patch.object(http_cache, 'DB_PATH', tempdir.name + '/c.db'),
+            patch.object(http_cache, 'HTTP_CACHE_MAX_SIZE', 1000),
+            patch.object(http_cache, 'MAX_ENTRY_SIZE', 400),
+            patch.object(http_cache, 'connections', local()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, send, url='http://example.com/', stream=False):
+        r = http_cache.request(
+            send, 'get', url, stream=stream, headers={'User-Agent': 'x'})
+        with r:
+            return r, r.content
+
+    def test_fresh_response_is_served_from_cache(self):
+        send = FakeSend(response(body=b'abc', cache_control='max-age=60'))
+        self.assertEqual(self.get(send)[1], b'abc')
+        r, content = self.get(send)
+        self.assertEqual(content, b'abc')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(send.calls), 1)
+
+    def test_no_store(self):
+        send = FakeSend(
+            response(body=b'1', cache_control='no-store, max-age=60'),
+            response(body=b'2', cache_control='no-store, max-age=60'))
+        self.get(send)
+        self.assertEqual(self.get(send)[1], b'2')
+
+    def test_revalidation_with_etag(self):
+        send = FakeSend(
+            response(body=b'abc', etag='"v1"', cache_control='no-cache'),
+            response(304, etag='"v1"', cache_control='max-age=60'))
+        self.get(send)
+        self.assertEqual(self.get(send)[1], b'abc')
+        self.assertEqual(send.calls[1]['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(send.calls[1]['headers']['User-Agent'], 'x')
+        # The 304 made the entry fresh.
+        self.assertEqual(self.get(send)[1], b'abc')
+        self.assertEqual(len(send.calls), 2)
+
+    def test_revalidation_with_last_modified(self):
+        lm = 'Mon, 01 Jan 2018 00:00:00 GMT'
+        send = FakeSend(
+            response(body=b'abc', last_modified=lm, expires='0'),
+            response(body=b'new', last_modified=lm, expires='0'))
+        self.get(send)
+        self.assertEqual(self.get(send)[1], b'new')
+        self.assertEqual(send.calls[1]['headers']['If-Modified-Since'], lm)
+
+    def test_streamed_response_larger_than_max_entry_size(self):
+        body = bytes(range(256)) * 3
+        send = FakeSend(
+            response(body=body, cache_control='max-age=60'),
+            response(body=body, cache_control='max-age=60'))
+        r = http_cache.request(send, 'get', 'http://example.com/', stream=True)
+        with r:
+            self.assertEqual(next(r.iter_content(500)), body[:500])
+        self.assertEqual(self.get(send)[1], body)
+        self.assertEqual(len(send.calls), 2)
+
+    def test_streamed_response_is_not_read_ahead(self):
+        raw = BytesIO(bytes(300))
+        send = FakeSend(
+            response(cache_control='max-age=60'),
+            response(body=b'abc', cache_control='max-age=60'))
+        send.responses[0].raw = raw
+        r = http_cache.request(send, 'get', 'http://example.com/', stream=True)
+        with r:
+            next(r.iter_content(100))
+            self.assertEqual(raw.tell(), 100)
+        # The partial body is not served to requests for the whole body.
+        self.assertEqual(self.get(send)[1], b'abc')
+
+    def test_truncated_entry(self):
+        body = bytes(range(250))
+        send = FakeSend(
+            response(body=body, cache_control='max-age=60'),
+            response(body=body, cache_control='max-age=60'))
+        for _ in range(2):
+            r = http_cache.request(
+                send, 'get', 'http://example.com/', stream=True)
+            with r:
+                self.assertEqual(next(r.iter_content(100)), body[:100])
+        self.assertEqual(len(send.calls), 1)
+        # Reading past the stored part sends the request again.
+        r = http_cache.request(send, 'get', 'http://example.com/', stream=True)
+        with r:
+            self.assertEqual(b''.join(r.iter_content(30)), body)
+        self.assertEqual(len(send.calls), 2)
+        # The whole body was recorded.
+        self.assertEqual(self.get(send)[1], body)
+        self.assertEqual(len(send.calls), 2)
+
+    def test_streamed_response_read_to_the_end_is_stored(self):
+        send = FakeSend(response(body=b'abc', cache_control='max-age=60'))
+        r = http_cache.request(send, 'get', 'http://example.com/', stream=True)
+        with r:
+            self.assertEqual(b''.join(r.iter_content(2)), b'abc')
+        self.assertEqual(self.get(send)[1], b'abc')
+        self.assertEqual(len(send.calls), 1)
+
+    def test_lru_eviction(self):
+        send = FakeSend(*(
+            response(body=bytes(300), cache_control='max-age=60')
+            for _ in range(5)))
+        for i in 'abc':
+            self.get(send, 'http://example.com/' + i)
+        self.get(send, 'http://example.com/a')  # a is used recently
+        self.get(send, 'http://example.com/d')
+        self.assertEqual(len(send.calls), 4)
+        self.get(send, 'http://example.com/a')
+        self.assertEqual(len(send.calls), 4)
+        self.get(send, 'http://example.com/b')  # evicted
+        self.assertEqual(len(send.calls), 5)
+
+    def test_key_includes_method_and_body(self):
+        self.assertNotEqual(
+            http_cache.cache_key('GET', 'http://a/', None),
+            http_cache.cache_key('GET', 'http://a/', {'q': '1'}))
+        self.assertNotEqual(
+            http_cache.cache_key('GET', 'http://a/', None),
+            http_cache.cache_key('POST', 'http://a/', None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test jsonld.py module."""
+
+
+from datetime import date
+from unittest import main, TestCase
+
+from lib.jsonld import find_jsonld
+
+
+NEWS_ARTICLE = '''
+<script type="application/ld+json">{"@type": "Organization", "name": "X"}
+</script>
+<script type="application/ld+json">
+{
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": "WebPage", "name": "Page"},
+        {
+            "@type": ["NewsArticle"],
+            "headline": "Big &amp; news",
+            "datePublished": "2019-05-04T10:00:00Z",
+            "author": [
+                {"@type": "Person", "name": "John Smith"},
+                {"@type": "Person", "givenName": "Jane", "familyName": "Doe"},
+                {"@type": "Organization", "name": "Example News Staff"}
+            ],
+            "publisher": {"@type": "Organization", "name": "Example News"}
+        }
+    ]
+}
+</script>
+'''
+
+SCHOLARLY_ARTICLE = '''
+<script type='application/ld+json'>{
+    "@type": "ScholarlyArticle",
+    "name": "A paper",
+    "author": "Ann Lee and Bob Ray",
+    "isPartOf": {
+        "@type": "PublicationIssue",
+        "isPartOf": {"@type": "Periodical", "name": "J. Things"}
+    }
+}</script>
+'''
+
+
+class FindJSONLDTest(TestCase):
+
+    def test_news_article(self):
+        self.assertEqual(find_jsonld(NEWS_ARTICLE), {
+            'title': 'Big & news',
+            'date': date(2019, 5, 4),
+            'authors': [('John', 'Smith'), ('Jane', 'Doe')],
+            'website': 'Example News'})
+
+    def test_scholarly_article(self):
+        self.assertEqual(find_jsonld(SCHOLARLY_ARTICLE), {
+            'title': 'A paper',
+            'authors': [('Ann', 'Lee'), ('Bob', 'Ray')],
+            'journal': 'J. Things'})
+
+    def test_invalid_json(self):
+        self.assertEqual(find_jsonld(
+            '<script type="application/ld+json">{"@type": </script>'), {})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Time the compiled patterns of the url extractors on the cached pages.
+
+Each pattern is run, without the timeout of lib.regex_timeout, on every html
+page of the responses cached in test/.tests_cache, or on the generated pages
+of test.urls_bench if there are none. The report has the time per MB of html
+and the slowest page of each pattern, slowest patterns first. Patterns that
+are only applied to short strings, e.g. bylines, are timed on whole pages
+too; this is their worst case.
+Run from the root directory of the project:
+
+    python -m test.regex_bench [pattern_name ...]
+"""
+
+
+from sys import argv
+from time import perf_counter
+
+from regex import Pattern
+
+from test.urls_bench import bench_pages
+from lib import charset, commons, jsonld, urls, urls_authors, \
+    urls_language, urls_profiles
+from lib.regex_timeout import TimedPattern
+
+
+# Modules whose patterns are run on web pages. A pattern that is imported
+# into another module is reported under the name of the first module.
+MODULES = (
+    commons, charset, urls_authors, urls, jsonld, urls_language,
+    urls_profiles)
+REPEAT = 3
+WORST_PAGES = 3
+
+
+def compiled_patterns() -> dict:
+    """Return {'module.NAME': method} for the pattern methods of MODULES.
+
+    The methods are those of the underlying regex Pattern objects.
+    """
+    patterns = {}
+    seen = set()
+    for module in MODULES:
+        for name, value in vars(module).items():
+            if isinstance(value, (TimedPattern, Pattern)):
+                # Pattern objects, e.g. BYLINE_PATTERN_SEARCH, are searched.
+                owner, method_name = value, 'search'
+            else:
+                owner = getattr(value, '__self__', None)
+                method_name = getattr(value, '__name__', None)
+            if isinstance(owner, TimedPattern):
+                owner = owner.pattern
+            if not isinstance(owner, Pattern):
+                continue
+            if (owner, method_name) in seen:
+                continue
+            seen.add((owner, method_name))
+            patterns[module.__name__.rpartition('.')[2] + '.' + name] = \
+                getattr(owner, method_name)
+    return patterns
+
+
+def run(method, text) -> None:
+    name = method.__name__
+    if name == 'sub':
+        method('', text)
+    elif name == 'finditer':
+        for _ in method(text):
+            pass
+    else:
+        method(text)
+
+
+def page_time(method, text) -> float:
+    """Return the best time of REPEAT runs of method on text."""
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = perf_counter()
+        run(method, text)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main():
+    pages = bench_pages()
+    byte_pages = {url: page.content for url, page in pages.items()}
+    pages = {url: page.html for url, page in pages.items()}
+    megabytes = sum(map(len, byte_pages.values())) / 1e6
+    print(len(pages), 'pages,', '%.1f MB' % megabytes)
+    patterns = compiled_patterns()
+    if argv[1:]:
+        patterns = {n: m for n, m in patterns.items() if n in argv[1:]}
+    results = []
+    for name, method in patterns.items():
+        texts = byte_pages if isinstance(
+            method.__self__.pattern, bytes) else pages
+        times = sorted(
+            ((page_time(method, text), url) for url, text in texts.items()),
+            reverse=True)
+        results.append((sum(t for t, _ in times) / megabytes, name, times))
+    results.sort(reverse=True)
+    for seconds_per_mb, name, times in results:
+        print('\n%-40s %9.2f ms/MB' % (name, seconds_per_mb * 1000))
+        for t, url in times[:WORST_PAGES]:
+            print('    %9.2f ms  %s' % (t * 1000, url))
+
+
+if __name__ == '__main__':
+    main()
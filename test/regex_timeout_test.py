@@ -0,0 +1,58 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test regex_timeout.py module."""
+
+
+from contextvars import copy_context
+from time import monotonic
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from lib import regex_timeout
+from lib.deadline import DEADLINE, Deadline
+from lib.regex_timeout import timed_compile, CURRENT_URL
+
+
+# Needs exponential time to fail on a long run of x characters.
+SLOW = timed_compile(r'(?:x+x+)+y')
+TEXT = 'ab' + 'x' * 5000
+
+
+@patch.object(regex_timeout, 'REGEX_TIMEOUT', .05)
+class TimedPatternTest(TestCase):
+
+    def test_timeouts_return_no_match(self):
+        start = monotonic()
+        with self.assertLogs(regex_timeout.logger) as logs:
+            self.assertIsNone(SLOW.search(TEXT))
+            self.assertIsNone(SLOW.match(TEXT, 2))
+            self.assertEqual(SLOW.findall(TEXT), [])
+            self.assertEqual(list(SLOW.finditer(TEXT)), [])
+            self.assertEqual(SLOW.sub('', TEXT), TEXT)
+            self.assertEqual(SLOW.split(TEXT), [TEXT])
+        self.assertLess(monotonic() - start, 2)
+        self.assertEqual(len(logs.output), 6)
+
+    def test_url_is_logged_and_deadline_degraded(self):
+        deadline = Deadline(10)
+
+        def search():
+            DEADLINE.set(deadline)
+            CURRENT_URL.set('http://example.com/')
+            return SLOW.search(TEXT)
+
+        with self.assertLogs(regex_timeout.logger) as logs:
+            self.assertIsNone(copy_context().run(search))
+        self.assertIn('http://example.com/', logs.output[0])
+        self.assertTrue(deadline.degraded)
+
+    def test_fast_patterns(self):
+        pattern = timed_compile(r'a(b)')
+        self.assertEqual(pattern.search('xab')[1], 'b')
+        self.assertEqual(pattern.sub('c', 'ab ab'), 'c c')
+        self.assertEqual([m[0] for m in pattern.finditer('ab ab')], ['ab'] * 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,11 @@
 
 from regex import compile as regex_compile, VERBOSE, IGNORECASE
 from unittest import main, expectedFailure, TestCase
+from unittest.mock import patch
 
-from lib.urls_authors import byline_to_names, BYLINE_PATTERN
+from lib import urls_authors
+from lib.urls_authors import byline_to_names, BYLINE_PATTERN, \
+    find_text_byline, visible_text
 
 BYLINE_PATTERN_REGEX = regex_compile(
     '^' + BYLINE_PATTERN + '$',
@@ -112,5 +115,27 @@ class BylineToNames(TestCase):
         self.assertEqual(last, 'The Editorial Board')
 
 
+class TextBylineTest(TestCase):
+
+    def test_scripts_styles_and_comments_are_not_visible(self):
+        self.assertEqual(''.join(visible_text(
+            '<style>p {}</style><p>a <b>b</b></p>\n<!-- c -->'
+            '<script type="x">d < e</script>f < g')), 'a b\nf < g')
+
+    def test_byline(self):
+        html = '<p>Title</p>\n<div>By <b>John Smith</b></div>\n'
+        self.assertEqual(find_text_byline(html), [('John', 'Smith')])
+        self.assertIsNone(find_text_byline(
+            '<p>x</p>\n<script>\nBy John Smith\n</script>'))
+
+    def test_byline_across_chunks(self):
+        html = '<p>' + 'x ' * 8000 + '</p>\n<p>By John Smith</p>\n'
+        for chunk in (100, 16000, 16010):
+            with self.subTest(chunk=chunk):
+                with patch.object(urls_authors, 'TEXT_CHUNK', chunk):
+                    self.assertEqual(
+                        find_text_byline(html), [('John', 'Smith')])
+
+
 if __name__ == '__main__':
     main()
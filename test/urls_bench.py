@@ -0,0 +1,123 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Compare whole-document and head-scoped meta extraction of urls.py.
+
+config.HEAD_SCOPED_META enables the head-scoped mode of MetaIndex.
+
+The html pages are taken from the responses cached in test/.tests_cache.
+If there are none, e.g. in a fresh checkout, GENERATED_PAGES pages are
+generated by generated_pages. Run from the root directory of the project:
+
+    python -m test.urls_bench
+"""
+
+
+from random import Random
+from time import perf_counter
+
+from test import cache
+from lib.urls import (
+    MetaIndex, Page, response_page, find_url, find_issn, find_pmid,
+    find_doi, find_volume, find_issue, find_pages, find_journal, find_date,
+    TITLE_META_NAMES, SITE_NAME_META_NAMES)
+
+
+REPEAT = 5
+# The number of paragraphs of the generated pages; the largest is about
+# as long as MAX_RESPONSE_LENGTH.
+GENERATED_PAGES = (10, 30, 100, 300, 1000, 5000)
+PARAGRAPH_WORDS = (
+    'the', 'of', 'and', 'study', 'results', 'data', 'between', 'may',
+    'analysis', 'report', '2015', 'new', 'York', 'by', 'patients', 'with')
+
+
+def cached_pages() -> dict:
+    """Return the Pages of the cached html responses by url."""
+    pages = {}
+    for key, response in cache.items():
+        if 'html' not in response.headers.get('content-type', ''):
+            continue
+        try:
+            page = response_page(response, response.content)
+            page.html  # skip the pages that cannot be decoded
+        except (LookupError, ValueError, TypeError):
+            continue
+        pages[key] = page
+    return pages
+
+
+def generated_page(paragraphs: int, random: Random) -> bytes:
+    """Return a news-like or article-like html page."""
+    words = [
+        ' '.join(random.choices(PARAGRAPH_WORDS, k=60))
+        for _ in range(paragraphs)]
+    body = ''.join(
+        '<div class="c%d"><p>%s <a href="/a/%d">link</a></p></div>\n'
+        % (i % 7, w, i) for i, w in enumerate(words))
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        '<title>Title of the article %d | Example News</title>'
+        '<meta property="og:site_name" content="Example News">'
+        '<meta property="og:title" content="Title of the article">'
+        '<meta name="citation_doi" content="10.1234/%d">'
+        '<meta name="citation_journal_title" content="Example Journal">'
+        '<meta name="citation_volume" content="12">'
+        '<meta name="citation_firstpage" content="100">'
+        '<meta name="citation_lastpage" content="110">'
+        '<meta name="citation_publication_date" content="2015/05/05">'
+        '<link rel="canonical" href="https://example.com/%d">'
+        '<script type="application/ld+json">{"@type": "NewsArticle",'
+        ' "datePublished": "2015-05-05"}</script>'
+        '</head><body><header><span class="byline">By John Smith and'
+        ' Jane Doe</span><time datetime="2015-05-05">May 5, 2015</time>'
+        '</header><article>%s</article>'
+        '<div itemscope><meta itemprop="name" content="x"></div>'
+        '<footer>Copyright 2015 Example News</footer></body></html>'
+        % (paragraphs, paragraphs, paragraphs, body)
+    ).encode()
+
+
+def generated_pages() -> dict:
+    """Return the Pages of GENERATED_PAGES by a made-up url."""
+    random = Random(0)
+    return {
+        'https://example.com/%d' % n:
+            Page(generated_page(n, random), 'utf-8')
+        for n in GENERATED_PAGES}
+
+
+def bench_pages() -> dict:
+    """Return cached_pages() or, if there are none, generated_pages()."""
+    return cached_pages() or generated_pages()
+
+
+def extract(page: Page, head_only: bool) -> tuple:
+    meta = MetaIndex(page.content, page.encoding, head_only)
+    return (
+        find_url(meta, ''), find_issn(meta), find_pmid(meta),
+        find_doi(meta), find_volume(meta), find_issue(meta),
+        find_pages(meta), find_journal(meta),
+        meta.first(SITE_NAME_META_NAMES), meta.first(TITLE_META_NAMES),
+        find_date(meta, page, ''))
+
+
+def main():
+    pages = [*bench_pages().values()]
+    print(len(pages), 'pages,', sum(len(p.content) for p in pages), 'bytes')
+    differences = sum(
+        extract(page, False) != extract(page, True) for page in pages)
+    print(differences, 'pages have different results')
+    for head_only in (False, True):
+        start = perf_counter()
+        for _ in range(REPEAT):
+            for page in pages:
+                extract(page, head_only)
+        print(
+            'head_only=' + str(head_only) + ':',
+            '%.1f ms per page'
+            % ((perf_counter() - start) * 1000 / REPEAT / len(pages)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test urls_language.py module."""
+
+
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from lib import urls_language
+from lib.urls import MetaIndex, Page
+from lib.urls_language import find_language, text_sample, LRUCache
+
+
+def language(html, hostname='example.com'):
+    return find_language(
+        Page(html.encode(), 'utf-8'), MetaIndex(html), hostname)
+
+
+class FindLanguageTest(TestCase):
+
+    def test_html_lang(self):
+        self.assertEqual(language('<html class="x" lang="en-US">'), 'en')
+        self.assertEqual(language("<HTML xml:lang='FA'>"), 'fa')
+
+    def test_meta_tags(self):
+        self.assertEqual(language(
+            '<html><head><meta property="og:locale" content="de_DE">'), 'de')
+        self.assertEqual(language(
+            '<html><head><meta http-equiv="Content-Language" content="fr">'
+        ), 'fr')
+
+    def test_undetermined_language_is_ignored(self):
+        self.assertEqual(language(
+            '<html lang="und"><head>'
+            '<meta property="og:locale" content="es_ES">'), 'es')
+
+    @patch.object(urls_language, 'DETECTED_LANGUAGES', LRUCache())
+    def test_detected_languages_are_cached_per_hostname(self):
+        html = (
+            '<html><head><title>x</title></head><body><script>var a;</script>'
+            '<p>Dies ist ein Satz, der in deutscher Sprache geschrieben ist.'
+            '</p></body></html>')
+        with patch.object(
+            urls_language, 'classify', return_value=('de', 1)
+        ) as classify:
+            self.assertEqual(language(html, 'a.com'), 'de')
+            self.assertEqual(language(html, 'a.com'), 'de')
+            self.assertEqual(classify.call_count, 1)
+            self.assertEqual(language(html, 'b.com'), 'de')
+            self.assertEqual(classify.call_count, 2)
+        self.assertEqual(
+            classify.call_args[0][0],
+            'Dies ist ein Satz, der in deutscher Sprache geschrieben ist.')
+
+    def test_sample_is_bounded(self):
+        html = '<body>' + '<p>word</p>' * 100000
+        sample = text_sample(html.encode(), 'utf-8', MetaIndex(html), 'title')
+        self.assertEqual(len(sample), urls_language.SAMPLE_LENGTH)
+
+
+if __name__ == '__main__':
+    main()
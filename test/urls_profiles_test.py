@@ -0,0 +1,57 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Test urls_profiles.py module."""
+
+
+from asyncio import run
+from collections import defaultdict
+from unittest import main, TestCase
+
+from lib.urls import MetaIndex, Page, profile_fields
+from lib.urls_profiles import find_profile, PROFILES
+
+
+def fields(html, url, html_title=None):
+    d = defaultdict(lambda: None)
+    run(profile_fields(
+        d, find_profile('www.nytimes.com'), MetaIndex(html), {},
+        Page(html.encode(), 'utf-8'), html_title, url, None))
+    return d
+
+
+class FindProfileTest(TestCase):
+
+    def test_find_profile(self):
+        self.assertIs(find_profile('www.nytimes.com'), PROFILES['nytimes.com'])
+        self.assertIs(find_profile('bbc.co.uk'), PROFILES['bbc.co.uk'])
+        self.assertIsNone(find_profile('dealbook.nytimes.com'))
+        self.assertIsNone(find_profile(None))
+
+
+class ProfileFieldsTest(TestCase):
+
+    def test_meta_tags(self):
+        d = fields(
+            '<meta property="og:title" content="A &amp; B">'
+            '<meta name="byl" content="By Ken Belson and Richard Sandomir">'
+            '<meta property="article:published_time" content="2014-05-30">',
+            'https://www.nytimes.com/2014/05/31/sports/a.html')
+        self.assertEqual(d['title'], 'A & B')
+        self.assertEqual(
+            d['authors'], [('Ken', 'Belson'), ('Richard', 'Sandomir')])
+        self.assertEqual(str(d['date']), '2014-05-30')
+        self.assertEqual(d['website'], 'The New York Times')
+
+    def test_fallbacks(self):
+        d = fields(
+            '<p>By Nobody Here</p>',
+            'https://www.nytimes.com/2007/06/13/world/a.html',
+            'Some title - The New York Times')
+        self.assertEqual(d['title'], 'Some title')
+        self.assertIsNone(d['authors'])  # bylines are not scanned
+        self.assertEqual(str(d['date']), '2007-06-13')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,31 @@
 """Test urls.py module."""
 
 
+from asyncio import get_running_loop, run, sleep
+from collections import Counter, defaultdict
+from datetime import date
+from difflib import get_close_matches
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from threading import Event, local
 from unittest import main, TestCase, skip
+from unittest.mock import ANY, patch
+from urllib.parse import urlparse
 
-from lib.urls import urls_sfn_cit_ref
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from test import cache as test_cache
+from lib import commons, http_cache, urls
+from lib.cache import TwoTierCache, MISSING
+from lib.commons import RateLimitError
+from lib.deadline import DEADLINE, Deadline
+from lib.urls import (
+    urls_sfn_cit_ref, get_home_title, get_page, read_html, decode_html,
+    BODY_WINDOW, CHUNK_SIZE, MAX_RESPONSE_LENGTH,
+    MetaIndex, find_doi, find_pages, find_pmid, find_date, Page, scan_date,
+    parse_title, parse_title_parts, CrossrefUpgrade, HomeTitle, generic_fields,
+    FetchCancelled, StreamedPage, find_html_title, response_page)
 
 
 class BostonTest(TestCase):
@@ -956,5 +978,551 @@ class Others(TestCase):
         )
 
 
+class HomeTitleCacheTest(TestCase):
+
+    def setUp(self):
+        patcher = patch.object(
+            urls, 'HOME_TITLE_CACHE', TwoTierCache('home_titles', 10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(urls, 'fetch_home_title', return_value='Example')
+    def test_home_title_is_cached_per_netloc(self, fetch_home_title):
+        self.assertEqual(get_home_title('https://example.com/a?b'), 'Example')
+        self.assertEqual(get_home_title('https://example.com/c'), 'Example')
+        get_home_title('http://example.com/c')
+        self.assertEqual(fetch_home_title.call_args_list, [
+            (('https://example.com', None),), (('http://example.com', None),)])
+
+    @patch.object(urls, 'fetch_home_title', return_value=None)
+    def test_failures_are_cached(self, fetch_home_title):
+        self.assertIsNone(get_home_title('https://example.com/a'))
+        self.assertIsNone(get_home_title('https://example.com/b'))
+        fetch_home_title.assert_called_once_with('https://example.com', None)
+
+    def test_deadline_failures_are_not_cached(self):
+        def response(*_, **__):
+            r = Response()
+            r.status_code = 200
+            r.url = 'http://example.com'
+            r.headers = CaseInsensitiveDict({'content-type': 'text/html'})
+            r.raw = BytesIO(b'<html><head><title>Example</title></head>')
+            return r
+
+        def citation(seconds):
+            token = DEADLINE.set(Deadline(seconds))
+            try:
+                return get_home_title('http://example.com/a')
+            finally:
+                DEADLINE.reset(token)
+
+        with patch.object(commons.SESSION, 'request', side_effect=response):
+            # The first citation has no time left.
+            self.assertIsNone(citation(-1))
+            self.assertEqual(citation(10), 'Example')
+
+    @patch.object(urls, 'get_head', side_effect=RateLimitError)
+    def test_rate_limited_failures_are_not_cached(self, get_head):
+        self.assertIsNone(get_home_title('http://example.com/a'))
+        self.assertIsNone(get_home_title('http://example.com/a'))
+        self.assertEqual(get_head.call_count, 2)
+
+    @patch.object(urls, 'fetch_home_title', return_value=None)
+    def test_degraded_failures_are_not_cached(self, fetch_home_title):
+        deadline = Deadline(10)
+        deadline.degraded = True
+        token = DEADLINE.set(deadline)
+        try:
+            self.assertIsNone(get_home_title('http://example.com/a'))
+        finally:
+            DEADLINE.reset(token)
+        self.assertIs(
+            urls.HOME_TITLE_CACHE.get('http://example.com'), MISSING)
+
+    def test_cancel_stops_a_running_fetch(self):
+        reading, cancelled, closed = Event(), Event(), Event()
+        reads = []
+
+        class Raw(BytesIO):
+            def read(self, size=-1):
+                reading.set()
+                cancelled.wait(5)
+                reads.append(size)
+                return super().read(size)
+
+            def close(self):
+                closed.set()
+                super().close()
+
+        r = Response()
+        r.status_code = 200
+        r.url = 'http://example.com/'
+        r.headers = CaseInsensitiveDict({'content-type': 'text/html'})
+        r.raw = Raw(b'<html><head>' + b'x' * MAX_RESPONSE_LENGTH)
+
+        async def cancel():
+            home_title = HomeTitle('http://example.com/a')
+            home_title.start()
+            loop = get_running_loop()
+            await loop.run_in_executor(None, reading.wait, 5)
+            home_title.cancel()
+            cancelled.set()
+            return await loop.run_in_executor(None, closed.wait, 5)
+
+        with patch.object(commons, 'send', return_value=r):
+            self.assertTrue(run(cancel()))
+        self.assertEqual(len(reads), 1)
+        # The result of a cancelled fetch is not cached.
+        self.assertIs(
+            urls.HOME_TITLE_CACHE.get('http://example.com'), MISSING)
+
+
+@patch.object(urls, 'get_home_title', return_value='Example: Home')
+class HomeTitleTest(TestCase):
+
+    @staticmethod
+    def site_name(html, delay=0):
+        async def fields():
+            home_title = HomeTitle('http://example.com/a')
+            await sleep(delay)
+            d = defaultdict(lambda: None)
+            await generic_fields(
+                d, MetaIndex(html), {}, Page(html.encode(), 'utf-8'),
+                'A - B', 'http://example.com/a', home_title)
+            return d['website']
+        return run(fields())
+
+    def test_only_fetched_when_needed(self, get_home_title):
+        self.assertEqual(self.site_name(
+            '<meta property="og:site_name" content="B">'), 'B')
+        get_home_title.assert_not_called()
+        self.assertEqual(self.site_name(''), 'Example')
+        get_home_title.assert_called_once_with('http://example.com/a', ANY)
+
+    @patch.object(urls, 'HOME_TITLE_HEAD_START', 0)
+    def test_head_start(self, get_home_title):
+        self.assertEqual(self.site_name(
+            '<meta property="og:site_name" content="B">', .01), 'B')
+        get_home_title.assert_called_once_with('http://example.com/a', ANY)
+
+
+class ReadHTMLTest(TestCase):
+
+    head = (
+        b'<html><head><title>T</title>'
+        b'<meta name="author" content="John Smith">'
+        b'<meta property="article:published_time" content="2019-05-04">'
+        b'</he')
+
+    @staticmethod
+    def chunks(*chunks):
+        yield from chunks
+        yield b'x' * BODY_WINDOW
+        yield b'x' * BODY_WINDOW
+        yield b'x' * BODY_WINDOW
+
+    def test_stop_after_body_window(self):
+        content = read_html(self.chunks(self.head, b'ad>'))
+        self.assertLess(len(content), 3 * BODY_WINDOW)
+
+    def test_body_is_needed(self):
+        content = read_html(self.chunks(
+            self.head.replace(b'author', b'x'), b'ad>'))
+        self.assertGreater(len(content), 3 * BODY_WINDOW)
+
+    def test_head_only(self):
+        self.assertEqual(
+            read_html(self.chunks(self.head, b'ad><body>'), head_only=True),
+            self.head + b'ad><body>')
+
+    def test_cancelled(self):
+        cancelled = Event()
+        read_html(self.chunks(b'<html><head>'), cancelled=cancelled)
+        cancelled.set()
+        self.assertRaises(
+            FetchCancelled, read_html, self.chunks(b'<html>'),
+            cancelled=cancelled)
+
+    def test_cacheable_response_is_not_read_ahead(self):
+        consumed = []
+
+        class Raw(BytesIO):
+            def read(self, size=-1):
+                data = super().read(size)
+                consumed.append(len(data))
+                return data
+
+        r = Response()
+        r.status_code = 200
+        r.url = 'http://example.com/etag'
+        r.headers = CaseInsensitiveDict(
+            {'content-type': 'text/html', 'etag': '"v1"'})
+        r.raw = Raw(self.head + b'ad>' + b'x' * MAX_RESPONSE_LENGTH)
+        with TemporaryDirectory() as tempdir, \
+                patch.object(http_cache, 'DB_PATH', tempdir + '/c.db'), \
+                patch.object(http_cache, 'HTTP_CACHE_MAX_SIZE', 10 ** 8), \
+                patch.object(http_cache, 'MAX_ENTRY_SIZE', 4 * 10 ** 6), \
+                patch.object(http_cache, 'connections', local()), \
+                patch.object(commons, 'send', return_value=r):
+            get_page(r.url)
+        self.assertLess(sum(consumed), BODY_WINDOW + 2 * CHUNK_SIZE)
+
+    def test_early_stopped_page_is_cached(self):
+        r = Response()
+        r.status_code = 200
+        r.url = 'http://example.com/article'
+        r.headers = CaseInsensitiveDict(
+            {'content-type': 'text/html', 'cache-control': 'max-age=60'})
+        r.raw = BytesIO(self.head + b'ad>' + b'x' * MAX_RESPONSE_LENGTH)
+        with TemporaryDirectory() as tempdir, \
+                patch.object(http_cache, 'DB_PATH', tempdir + '/c.db'), \
+                patch.object(http_cache, 'HTTP_CACHE_MAX_SIZE', 10 ** 8), \
+                patch.object(http_cache, 'MAX_ENTRY_SIZE', 4 * 10 ** 6), \
+                patch.object(http_cache, 'connections', local()), \
+                patch.object(commons, 'send', side_effect=[r]) as send:
+            page = get_page(r.url)
+            self.assertLess(len(page.content), MAX_RESPONSE_LENGTH)
+            # The second citation of the page is served from the cache.
+            self.assertEqual(get_page(r.url).content, page.content)
+        send.assert_called_once()
+
+    def test_streamed_page(self):
+        body = self.head + b'ad><body>' + b'x' * (3 * CHUNK_SIZE)
+        r = Response()
+        r.status_code = 200
+        r.url = 'http://example.com/a'
+        r.headers = CaseInsensitiveDict({'content-type': 'text/html'})
+        r.raw = BytesIO(body)
+        streamed = StreamedPage(r.url)
+        with patch.object(commons, 'send', side_effect=[r]) as send:
+            head = streamed.read_head()
+            page = streamed.read_page()
+        send.assert_called_once()
+        self.assertEqual(find_html_title(head.content), 'T')
+        self.assertGreater(len(page.content), len(head.content))
+        # The same part of the page as get_page reads.
+        self.assertEqual(page.content, read_html(
+            body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)))
+
+    def test_decode_cut_character(self):
+        self.assertEqual(
+            decode_html('<meta charset="utf-8">é'.encode()[:-1], None),
+            '<meta charset="utf-8">')
+
+
+class MetaIndexTest(TestCase):
+
+    def test_meta_index(self):
+        meta = MetaIndex(
+            '<meta content="10" name="citation_firstpage">'
+            "<meta name='citation_lastpage' content='20'>"
+            '<meta property="OG:Title" content="a > b">'
+            '<meta name="title" content="">'
+            '<meta name="date" content="soon">'
+            '<meta name="pubdate" content="May 5, 2015">')
+        self.assertEqual(meta.first(('title', 'og:title')), 'a > b')
+        self.assertEqual(find_pages(meta), '10–20')
+        self.assertEqual(str(find_date(meta, '', '')), '2015-05-05')
+
+    def test_body_meta_tags(self):
+        meta = MetaIndex(
+            '<head><meta name="citation_doi" content="10.1/a"></head>'
+            '<body><meta name="citation_pmid" content="1"></body>')
+        self.assertEqual(find_doi(meta), '10.1/a')
+        self.assertEqual(find_pmid(meta), '1')
+
+    def test_head_only(self):
+        html = (
+            '<head><meta name="citation_doi" content="10.1/a"></head>'
+            '<body><meta name="citation_pmid" content="1"></body>')
+        meta = MetaIndex(html, head_only=True)
+        self.assertEqual(find_doi(meta), '10.1/a')
+        self.assertIsNone(find_pmid(meta))
+        # Documents without meta tags in their head are indexed entirely.
+        self.assertEqual(
+            find_pmid(MetaIndex('<head></head>' + html[56:], head_only=True)),
+            '1')
+
+
+class ScanDateTest(TestCase):
+
+    @staticmethod
+    def scan(html):
+        return str(scan_date(Page(html.encode(), 'utf-8')))
+
+    def test_time_tag(self):
+        self.assertEqual(self.scan(
+            '<body>May 1, 2001 <h1>T</h1> May 2, 2002'
+            '<time class="x" datetime="2003-03-03T10:00">'), '2003-03-03')
+
+    def test_anchor_region(self):
+        self.assertEqual(self.scan(
+            '<head><style>.byline {}</style></head><body>May 1, 2001'
+            '<h1>Title</h1><p class="byline">By A B, May 2, 2002</p>'),
+            '2002-05-02')
+
+    def test_body_window(self):
+        self.assertEqual(
+            self.scan('<head>May 1, 2001</head><body> May 2, 2002'),
+            '2002-05-02')
+        html = '<body>' + ' ' * urls.BODY_DATE_WINDOW + 'May 2, 2002'
+        self.assertEqual(self.scan(html), 'None')
+
+
+# (hostname, site name) pairs whose site name is not found in the hostname
+# by the first step of parse_title_parts.
+SITE_NAMES = (
+    ('bostonmagazine.com', 'Boston Magazine'),
+    ('washingtonpost.com', 'Washington Post'),
+    ('huffingtonpost.ca', 'The Huffington Post'),
+    ('dailymail.co.uk', 'Daily Mail Online'), ('bbc.com', 'BBC News'),
+    ('nytimes.com', 'The New York Times'), ('tgdaily.com', 'TG Daily'),
+    ('abcnews.go.com', 'ABC News Blogs'),
+    ('eff.org', 'Electronic Frontier Foundation'),
+    ('arstechnica.com', 'Ars Technica'), ('livescience.com', 'Live Science'),
+    ('news.mit.edu', 'MIT News'), ('theguardian.com', 'the Guardian'),
+    ('thetimes.co.uk', 'The Times & The Sunday Times'),
+    ('businessnewsdaily.com', 'Business News Daily'),
+    ('thebulletin.org', 'Bulletin of the Atomic Scientists'),
+    ('highbeam.com', 'HighBeam Research'),
+    ('independent.co.uk', 'The Independent'), ('ft.com', 'Financial Times'),
+    ('latimes.com', 'Los Angeles Times'), ('cnn.com', 'CNN'),
+    ('scientificamerican.com', 'Scientific American'),
+    ('economist.com', 'The Economist'), ('usatoday.com', 'USA TODAY'),
+    ('aljazeera.com', 'Al Jazeera'), ('lemonde.fr', 'Le Monde.fr'),
+    ('spiegel.de', 'DER SPIEGEL'), ('elpais.com', 'EL PAÍS'),
+    ('smh.com.au', 'The Sydney Morning Herald'), ('cbc.ca', 'CBC News'),
+    ('timesofindia.indiatimes.com', 'Times of India'),
+    ('farsnews.com', 'خبرگزاری فارس'), ('isna.ir', 'ایسنا'),
+    ('who.int', 'World Health Organization'),
+    ('stackoverflow.com', 'Stack Overflow'),
+    ('hollywoodreporter.com', 'The Hollywood Reporter'),
+    ('nbcnews.com', 'NBC News'), ('slate.com', 'Slate Magazine'),
+    ('smithsonianmag.com', 'Smithsonian Magazine'),
+    ('pbs.org', 'PBS NewsHour'), ('apnews.com', 'AP News'),
+    ('businessinsider.com', 'Business Insider'),
+    ('newscientist.com', 'New Scientist'),
+    ('irishtimes.com', 'The Irish Times'),
+    ('jpost.com', 'The Jerusalem Post'), ('tehrantimes.com', 'Tehran Times'),
+)
+ARTICLE_TITLES = (
+    'Sea otter return boosts ailing seagrass in California',
+    'Right to Be Forgotten? Not That Easy', 'Dynamometers Explained',
+    'Israel says it has shot down drone launched from Gaza',
+    'The Investment column: TT Group', 'Obituary: John Smith',
+    'برجام شرایط بین\u200cالمللی ایران را کاملا متحول کرد', 'Review')
+SECTIONS = ('World', 'Health', 'Opinion', 'Business news', 'Middle East')
+TITLE_FORMATS = (
+    '{a} - {s}', '{s} | {a}', '{a} | {c} | {s}', '{c} - {a} - {s}')
+
+
+# Titles that do not have the name of their site.
+UNNAMED_TITLE_FORMATS = ('{a} - {c}', '{c} | {a}')
+# How the site names chosen by difflib may change, see site_name_changes.
+ACCEPTED_CHANGES = {
+    (None, 'site name'), ('other part', 'site name'), ('other part', None)}
+
+
+def difflib_closest_part(hostname):
+    """Return the closest_part that used difflib on the whole hostname.
+
+    The home titles are joined again; the home titles of the tests have no
+    other separator than ' - '.
+    """
+    def closest_part(targets, parts):
+        target = ' - '.join(targets)
+        if target == hostname.rpartition('.')[0]:
+            target = hostname
+        close_matches = get_close_matches(target, parts, 1, .3)
+        return close_matches[0] if close_matches else None
+    return closest_part
+
+
+def site_name_changes(cases) -> Counter:
+    """Count how the site names chosen by difflib are changed by bigrams.
+
+    cases are (title, hostname, home_title, site_name) tuples, site_name is
+    None if the title does not have it. The keys of the counter are pairs of
+    kinds, i.e. 'site name', 'other part' or None, of the differing choices.
+    """
+    parse = parse_title_parts.__wrapped__
+    changes = Counter()
+    for title, hostname, home_title, site_name in cases:
+        args = title, hostname, None, home_title
+        with patch.object(
+            urls, 'closest_part', difflib_closest_part(hostname)
+        ):
+            by_difflib = parse(*args)[2]
+        by_bigrams = parse(*args)[2]
+        if by_difflib != by_bigrams:
+            changes[tuple(
+                None if choice is None
+                else 'site name' if choice == site_name else 'other part'
+                for choice in (by_difflib, by_bigrams))] += 1
+    return changes
+
+
+def generated_titles():
+    """Yield the site name cases of SITE_NAMES."""
+    for i, (hostname, site_name) in enumerate(SITE_NAMES):
+        article = ARTICLE_TITLES[i % len(ARTICLE_TITLES)]
+        section = SECTIONS[i % len(SECTIONS)]
+        for title_format in TITLE_FORMATS + UNNAMED_TITLE_FORMATS:
+            title = title_format.format(a=article, s=site_name, c=section)
+            for home_title in (None, site_name + ' - Home', 'Home'):
+                yield (
+                    title, hostname, home_title,
+                    site_name if title_format in TITLE_FORMATS else None)
+
+
+def cached_titles():
+    """Yield the site name cases of the html pages in test/.tests_cache.
+
+    The og:site_name meta tag of a page is taken as its site name.
+    """
+    for url, response in test_cache.items():
+        if 'html' not in response.headers.get('content-type', ''):
+            continue
+        try:
+            page = response_page(response, response.content)
+            title = find_html_title(page.content, page.encoding)
+        except (LookupError, ValueError, TypeError):
+            continue
+        if title:
+            site_name = MetaIndex(page.content, page.encoding).first(
+                ('og:site_name',))
+            yield title, urlparse(url).hostname or '', None, site_name
+
+
+class ParseTitleTest(TestCase):
+
+    def test_site_names(self):
+        ft = 'http://www.ft.com/cms/s/ea29ffb6-c759-11e0-9cac-00144feabdc0'
+        self.assertEqual(
+            parse_title('Rockhopper raises Falklands oil estimate - FT.com',
+                        ft, None),
+            (None, 'Rockhopper raises Falklands oil estimate', 'FT.com'))
+        self.assertEqual(
+            parse_title('Alpha decay - Wikipedia, the free encyclopedia',
+                        'https://en.wikipedia.org/wiki/Alpha_decay', None),
+            (None, 'Alpha decay', 'Wikipedia, the free encyclopedia'))
+        self.assertEqual(
+            parse_title('Some story - Jim Doe - Dawn Daily',
+                        'http://dawn.com/x', [('Jim', 'Doe')], 'Dawn: Home'),
+            ('Jim Doe', 'Some story', 'Dawn Daily'))
+        self.assertEqual(
+            parse_title('Story - Sección', 'http://abc.es/x', None,
+                        'Unrelated'),
+            (None, 'Story - Sección', None))
+
+    def test_same_site_names_as_difflib(self):
+        """Site names are only found where difflib found another part."""
+        # 828 titles, 276 of them do not have the site name.
+        self.assertEqual(site_name_changes(generated_titles()), {
+            (None, 'site name'): 58,
+            ('other part', 'site name'): 10,
+            ('other part', None): 56,
+        })
+
+    def test_same_site_names_as_difflib_on_cached_pages(self):
+        cases = [*cached_titles()]
+        if not cases:
+            self.skipTest('test/.tests_cache has no html pages')
+        changes = site_name_changes(cases)
+        self.assertLessEqual(changes.keys(), ACCEPTED_CHANGES, changes)
+
+    def test_results_are_memoized(self):
+        args = 'A - B - Example', 'http://example.com/', [('C', 'B')]
+        parse_title(*args)
+        hits = parse_title_parts.cache_info().hits
+        self.assertEqual(parse_title(*args), ('B', 'A', 'Example'))
+        self.assertEqual(parse_title_parts.cache_info().hits, hits + 1)
+
+
+@patch.object(urls, 'CROSSREF_BUDGET', .1)
+class CrossrefUpgradeTest(TestCase):
+
+    @staticmethod
+    def merge(delay, head=b'', error=None):
+        d = defaultdict(lambda: None, {
+            'title': 'Page title', 'cite_type': 'journal', 'year': '2015',
+            'date': date(2015, 1, 2), 'url': 'http://example.com/a'})
+        calls = []
+
+        async def doi_dict(doi):
+            calls.append(doi)
+            await sleep(delay)
+            if error is not None:
+                raise error
+            return defaultdict(lambda: None, {
+                'title': 'Record title', 'cite_type': 'journal-article',
+                'year': '2014', 'url': 'http://dx.doi.org/' + doi})
+
+        async def merge():
+            crossref = CrossrefUpgrade()
+            crossref.on_head(head)
+            await sleep(0)
+            await crossref.merge(d, '10.1/x')
+
+        with patch.object(urls, 'doi_dict', doi_dict):
+            run(merge())
+        return d, calls
+
+    def test_merge(self):
+        d, calls = self.merge(
+            0, b'<meta name="citation_doi" content="10.1/x">')
+        self.assertEqual(calls, ['10.1/x'])  # started by on_head
+        self.assertEqual(d['title'], 'Record title')
+        self.assertEqual(d['cite_type'], 'journal-article')
+        self.assertEqual(d['year'], '2014')
+        self.assertIsNone(d['date'])
+        self.assertEqual(d['url'], 'http://example.com/a')
+
+    def test_budget(self):
+        d, calls = self.merge(1)
+        self.assertEqual(calls, ['10.1/x'])
+        self.assertEqual(d['title'], 'Page title')
+        self.assertEqual(d['date'], date(2015, 1, 2))
+
+    def test_failed_lookup(self):
+        with self.assertLogs(urls.logger, 'WARNING'):
+            d, calls = self.merge(0, error=ZeroDivisionError)
+        self.assertEqual(calls, ['10.1/x'])
+        self.assertEqual(d['title'], 'Page title')
+        self.assertEqual(d['date'], date(2015, 1, 2))
+
+
+
+class PageDictTest(TestCase):
+
+    def test_tasks_are_cancelled_on_errors(self):
+        head = b'<head><meta name="citation_doi" content="10.1/x"></head>'
+
+        def get_page(url):
+            urls.HEAD_CALLBACK.get()(head)
+            return Page(head, 'utf-8')
+
+        async def doi_dict(doi):
+            await sleep(5)
+
+        with patch.object(urls, 'CROSSREF_UPGRADE', True), \
+                patch.object(urls, 'doi_dict', doi_dict), \
+                patch.object(urls, 'get_page', get_page), \
+                patch.object(urls, 'generic_fields', side_effect=ValueError), \
+                patch.object(
+                    HomeTitle, 'cancel', autospec=True,
+                    side_effect=HomeTitle.cancel) as home_title_cancel, \
+                patch.object(
+                    CrossrefUpgrade, 'cancel', autospec=True,
+                    side_effect=CrossrefUpgrade.cancel) as crossref_cancel:
+            with self.assertRaises(ValueError):
+                run(urls.page_dict('http://example.com/a'))
+        home_title_cancel.assert_called_once()
+        crossref_cancel.assert_called_once()
+        crossref = crossref_cancel.call_args[0][0]
+        self.assertEqual([*crossref.tasks], ['10.1/x'])
+        self.assertTrue(crossref.tasks['10.1/x'].cancelled())
+
+
 if __name__ == '__main__':
     main()
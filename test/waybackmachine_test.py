@@ -4,9 +4,14 @@
 """Test urls.py module."""
 
 
+from asyncio import run
+from collections import defaultdict
 from unittest import main, TestCase
+from unittest.mock import AsyncMock, Mock, patch
 
-from lib.waybackmachine import waybackmachine_sfn_cit_ref
+from lib import waybackmachine
+from lib.urls import Page
+from lib.waybackmachine import waybackmachine_sfn_cit_ref, waybackmachine_dict
 
 
 class WaybackmachineResponse(TestCase):
@@ -107,5 +112,75 @@ class WaybackmachineResponse(TestCase):
         self.assertIn(ct, o[1])
 
 
+class PipelineTest(TestCase):
+
+    archive_url = 'https://web.archive.org/web/20070429193849/http://a.b/c'
+
+    def run_dict(self, archive_dict, head, original_dict=None):
+        page_dict = AsyncMock(side_effect=[
+            defaultdict(lambda: None, archive_dict),
+            defaultdict(lambda: None, original_dict or {})])
+        self.original = Mock()
+        self.original.read_head.return_value = Page(head, 'utf-8')
+        with patch.object(waybackmachine, 'page_dict', page_dict), \
+                patch.object(
+                    waybackmachine, 'StreamedPage',
+                    return_value=self.original):
+            d = run(waybackmachine_dict.__wrapped__(self.archive_url))
+        return d, page_dict.call_args_list
+
+    def test_complete_snapshot(self):
+        d, calls = self.run_dict({
+            'title': 'T', 'authors': [('A', 'B')], 'date': 1,
+            'html_title': 'T - S'}, b'<title>T - S</title>')
+        self.assertEqual(len(calls), 1)
+        url, raw_url, home_title = calls[0][0]
+        self.assertEqual(url, 'http://a.b/c')
+        self.assertEqual(
+            raw_url, 'https://web.archive.org/web/20070429193849id_/'
+            'http://a.b/c')
+        self.assertEqual(d['url-status'], 'live')
+        self.assertEqual(d['url'], 'http://a.b/c')
+        # The rest of the original is not read.
+        self.original.close.assert_called_once_with()
+
+    def test_incomplete_snapshot(self):
+        d, calls = self.run_dict(
+            {'title': 'T', 'html_title': 'T'}, b'<title>T</title>',
+            {'title': 'U', 'authors': [('A', 'B')]})
+        self.assertEqual(len(calls), 2)
+        # The home title is shared.
+        self.assertIs(calls[1][1]['home_title'], calls[0][0][2])
+        # The original page continues the response of its head.
+        self.assertIs(calls[1][1]['streamed'], self.original)
+        # The data of the live original takes precedence.
+        self.assertEqual(d['title'], 'U')
+        self.assertEqual(d['authors'], [('A', 'B')])
+        self.assertEqual(d['url-status'], 'live')
+
+    def test_live_by_title(self):
+        d, calls = self.run_dict(
+            {'title': 'T', 'html_title': 'T - S', 'website': 'S'},
+            b'<title>T | S</title>',
+            {'title': 'T', 'html_title': 'T | S', 'website': 'S2'})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(d['url-status'], 'live')
+        self.assertEqual(d['website'], 'S2')
+
+    def test_unfit_original(self):
+        d, calls = self.run_dict(
+            {'title': 'T', 'html_title': 'T'}, b'<title>U</title>',
+            {'title': 'U', 'html_title': 'U'})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(d['url-status'], 'unfit')
+        self.assertEqual(d['title'], 'T')
+
+    def test_wayback_machine_website(self):
+        d, _ = self.run_dict(
+            {'title': 'T', 'html_title': 'T', 'website': 'Wayback Machine'},
+            b'<title>T</title>')
+        self.assertEqual(d['website'], 'a.b')
+
+
 if __name__ == '__main__':
     main()